@@ -0,0 +1,388 @@
+import asyncio
+import itertools
+import serial
+
+import synscancodec
+from synscancodec import TERMINATOR, REPLY_ACK, REPLY_BOOL, REPLY_BYTE, REPLY_8BYTES, REPLY_VERSION
+from synscanserial import SynScanAZ, MountStatus, MountNotConnected, MountTimeout, MountProtocolError
+from synscanstats import MountStats
+
+
+# Request priorities, lower number is written first
+PRIORITY_STOP = 0
+PRIORITY_GOTO = 1
+PRIORITY_NORMAL = 2
+PRIORITY_MONITOR = 3
+
+
+
+class AsyncSynScanAZ ( object ):
+	"""asyncio client for the SynScan AZ hand controller. Requests are queued by priority and written one at a
+	time by a single writer task, replies are read from the event loop without blocking threads (POSIX ports)."""
+
+	# Same budgets as the blocking client
+	TIMEOUT_POSITION	= SynScanAZ.TIMEOUT_POSITION
+	TIMEOUT_STATUS		= SynScanAZ.TIMEOUT_STATUS
+	TIMEOUT_GOTO		= SynScanAZ.TIMEOUT_GOTO
+	TIMEOUT_DEFAULT		= SynScanAZ.TIMEOUT_DEFAULT
+	RESYNC_QUIET		= SynScanAZ.RESYNC_QUIET
+
+	def __init__ ( self, port = '/dev/ttyUSB0' ):
+		self.port = port
+		self.ser = None
+		self.isConnected = False
+		self.statistics = MountStats()
+
+		self.stepIsPrecise = False
+		self.trackingMode = None
+		self.isTelescope = True
+		self.feed = [ 0., 90. ]
+		self.site = None
+
+		self._loop = None
+		self._queue = None
+		self._sequence = itertools.count()
+		self._buffer = bytearray()
+		self._dataReady = None
+		self._writer = None
+		self._current = None		# ( cmd, future ) the writer is waiting on
+		self._slewWaiters = []
+		self._slewMonitor = None
+
+
+
+	async def connect ( self ):
+		# Open the port and start the writer task
+		self._loop = asyncio.get_running_loop()
+		self._queue = asyncio.PriorityQueue()
+		self._dataReady = asyncio.Event()
+
+		self.ser = serial.Serial( port = self.port, baudrate = 9600, parity = 'N', stopbits = 1, timeout = 0 )
+		self._loop.add_reader( self.ser.fileno(), self._onReadable )
+		self.isConnected = True
+		self._writer = asyncio.create_task( self._run() )
+
+
+
+	async def close ( self ):
+		if not self.isConnected:
+			return
+
+		self.isConnected = False
+		self._writer.cancel()
+		if self._slewMonitor is not None:
+			self._slewMonitor.cancel()
+		self._loop.remove_reader( self.ser.fileno() )
+		self.ser.close()
+
+		# Nothing will answer now, fail the request being read, everything queued and every slew waiter
+		pending = [ self._current ] if self._current is not None else []
+		while not self._queue.empty():
+			priority, _, cmd, replies, timeout, future = self._queue.get_nowait()
+			pending.append( ( cmd, future ))
+		pending += [ ( b'L', waiter ) for waiter in self._slewWaiters ]
+		self._current = None
+		self._slewWaiters = []
+
+		for cmd, future in pending:
+			if not future.done():
+				future.set_exception( MountNotConnected( cmd[:1] ))
+
+
+
+	async def __aenter__ ( self ):
+		await self.connect()
+		return self
+
+
+
+	async def __aexit__ ( self, *exc ):
+		await self.close()
+
+
+
+	def _onReadable ( self ):
+		data = self.ser.read( self.ser.in_waiting or 1 )
+		if data:
+			self._buffer += data
+			self._dataReady.set()
+
+
+
+	def request ( self, cmd, replies, timeout, priority = PRIORITY_NORMAL ):
+		# Queue cmd and return a future for its replies. replies is a sequence of ( format, length, binary ),
+		# more than one means a pipelined batch. Cancelling the future before it is written drops the request.
+		if not self.isConnected:
+			raise MountNotConnected( bytes( cmd[:1] ))
+
+		future = self._loop.create_future()
+		self._queue.put_nowait( ( priority, next( self._sequence ), bytes( cmd ), replies, timeout, future ))
+		return future
+
+
+
+	async def _run ( self ):
+		while True:
+			priority, _, cmd, replies, timeout, future = await self._queue.get()
+
+			if future.done():
+				continue	# Cancelled while queued, never hits the wire
+
+			self._current = ( cmd, future )
+			start = self._loop.time()
+			try:
+				self.ser.write( cmd )
+			except serial.SerialException:
+				self.statistics.recordWriteFailure( chr( cmd[0] ))
+				future.set_exception( MountTimeout( cmd[:1] ))
+				continue
+			frames = []
+			error = None
+
+			for replyFormat, replyLength, binary in replies:
+				try:
+					frame = await asyncio.wait_for( self._readFrame( replyLength, binary ), timeout )
+				except asyncio.TimeoutError:
+					error = MountTimeout( cmd[:1], bytes( self._buffer ))
+					self.statistics.recordTimeout( chr( cmd[0] ))
+					break
+
+				if replyFormat.fullmatch( frame ) is None:
+					error = MountProtocolError( cmd[:1], frame )
+					self.statistics.recordGarbled( chr( cmd[0] ))
+					break
+
+				frames.append( frame )
+
+			if error is not None:
+				await self._resync()
+				if not future.done():
+					future.set_exception( error )
+				continue
+
+			self.statistics.record( chr( cmd[0] ) if len( replies ) == 1 else "status", self._loop.time() - start )
+			if not future.done():
+				future.set_result( frames )
+
+
+
+	async def _readFrame ( self, replyLength, binary ):
+		# Wait for one reply of replyLength bytes, or up to the terminator for text replies
+		while True:
+			buffer = self._buffer
+			if binary:
+				end = replyLength if len( buffer ) >= replyLength else -1
+			else:
+				end = buffer.find( TERMINATOR, 0, replyLength )
+				end = end + 1 if end >= 0 else ( replyLength if len( buffer ) >= replyLength else -1 )
+
+			if end > 0:
+				frame = bytes( buffer[ : end ] )
+				del buffer[ : end ]
+				return frame
+
+			self._dataReady.clear()
+			await self._dataReady.wait()
+
+
+
+	async def _resync ( self ):
+		# Drop buffered bytes and anything still arriving until the line has been quiet for RESYNC_QUIET
+		while True:
+			self._buffer.clear()
+			self._dataReady.clear()
+			try:
+				await asyncio.wait_for( self._dataReady.wait(), self.RESYNC_QUIET )
+			except asyncio.TimeoutError:
+				return
+
+
+
+	async def _exchange ( self, cmd, replyFormat, replyLength, timeout, binary = False, priority = PRIORITY_NORMAL ):
+		frames = await self.request( cmd, ( ( replyFormat, replyLength, binary ), ), timeout, priority )
+		return frames[0]
+
+
+
+	async def _queryPosition ( self, name ):
+		command = synscancodec.COMMANDS[name]
+		reply = await self._exchange( command.query, command.format.replyFormat, command.format.replyLength, self.TIMEOUT_POSITION )
+		return command.format.decode( reply )
+
+
+
+	async def _sendPosition ( self, name, coords, priority = PRIORITY_GOTO ):
+		# The codec buffer is reused, request() copies it before the next encode
+		await self._exchange( synscancodec.encodePosition( name, coords ), REPLY_ACK, 1, self.TIMEOUT_GOTO, priority = priority )
+
+
+
+	async def getStatus ( self, precise = True ):
+		# Slew state, Azm/Alt and RA/Dec in one pipelined round trip. Returns MountStatus.
+		azmAlt = synscancodec.COMMANDS[ 'getAzmAltPrecise' if precise else 'getAzmAltCoarse' ]
+		raDec = synscancodec.COMMANDS[ 'getRaDecPrecise' if precise else 'getRaDec' ]
+
+		slewing, azmAltReply, raDecReply = await self.request(
+									b'L' + azmAlt.query + raDec.query,
+									(
+										( REPLY_BOOL, 2, False ),
+										( azmAlt.format.replyFormat, azmAlt.format.replyLength, False ),
+										( raDec.format.replyFormat, raDec.format.replyLength, False ),
+									),
+									self.TIMEOUT_POSITION )
+
+		azm, alt = azmAlt.format.decode( azmAltReply )
+		ra, dec = raDec.format.decode( raDecReply )
+		return MountStatus( slewing[0] == 0x31, azm, alt, ra, dec )
+
+
+
+	async def getRaDec ( self ):
+		return await self._queryPosition( 'getRaDec' )
+
+	async def getRaDecPrecise ( self ):
+		return await self._queryPosition( 'getRaDecPrecise' )
+
+	async def getAzmAltCoarse ( self ):
+		return await self._queryPosition( 'getAzmAltCoarse' )
+
+	async def getAzmAltPrecise ( self ):
+		return await self._queryPosition( 'getAzmAltPrecise' )
+
+
+
+	async def gotoRaDec ( self, coords ):
+		# Slew to the given coordinates, mirror mode as in SynScanAZ.gotoRaDec
+		if not self.isTelescope:
+			await self.gotoAzmAlt( await self.mirrorPointing( coords ))
+			return
+
+		await self._sendPosition( 'gotoRaDecPrecise' if self.stepIsPrecise else 'gotoRaDecCoarse', coords )
+
+	async def mirrorPointing ( self, coords ):
+		# Mirror [azm, alt] for an RA/Dec target, see SynScanAZ.mirrorPointing
+		from synscancoords import Site
+
+		if self.site is None:
+			if not hasattr( self, "latitude" ):
+				self.longitude, self.latitude = await self.getGeoLocation()
+			self.site = Site( self.latitude, self.longitude )
+
+		return self.site.mirrorPointing( coords[0], coords[1], self.feed )
+
+	async def gotoRaDecCoarse ( self, coords ):
+		await self._sendPosition( 'gotoRaDecCoarse', coords )
+
+	async def gotoRaDecPrecise ( self, coords ):
+		await self._sendPosition( 'gotoRaDecPrecise', coords )
+
+	async def gotoAzmAlt ( self, coords ):
+		await self._sendPosition( 'gotoAzmAltPrecise' if self.stepIsPrecise else 'gotoAzmAltCoarse', coords )
+
+	async def gotoAzmAltCoarse ( self, coords ):
+		await self._sendPosition( 'gotoAzmAltCoarse', coords )
+
+	async def gotoAzmAltPrecise ( self, coords ):
+		await self._sendPosition( 'gotoAzmAltPrecise', coords )
+
+	async def syncRaDec ( self, coords ):
+		await self._sendPosition( 'syncRaDecPrecise' if self.stepIsPrecise else 'syncRaDecCoarse', coords, PRIORITY_NORMAL )
+
+	async def syncRaDecCoarse ( self, coords ):
+		await self._sendPosition( 'syncRaDecCoarse', coords, PRIORITY_NORMAL )
+
+	async def syncRaDecPrecise ( self, coords ):
+		await self._sendPosition( 'syncRaDecPrecise', coords, PRIORITY_NORMAL )
+
+
+
+	async def setTrackingMode ( self, mode ):
+		# 0 = tracking off, 1 = Alt/Az tracking, 2 = Equatorial tracking, 3 = PEC mode
+		if int(mode) > 3:
+			raise ValueError("Argument error, possible values are 0-3")
+
+		# Stopping tracking shares the stop lane with cancelGoto
+		priority = PRIORITY_STOP if int(mode) == 0 else PRIORITY_GOTO
+		await self._exchange( bytes( ( 0x54, int( mode ) ) ), REPLY_ACK, 1, self.TIMEOUT_GOTO, priority = priority )
+		self.trackingMode = int( mode )
+
+
+
+	async def isSlewing ( self ):
+		reply = await self._exchange( b'L', REPLY_BOOL, 2, self.TIMEOUT_STATUS )
+		return reply[0] == 0x31
+
+
+
+	async def cancelGoto ( self ):
+		# Jumps ahead of every queued poll and goto
+		await self._exchange( b'M', REPLY_ACK, 1, self.TIMEOUT_GOTO, priority = PRIORITY_STOP )
+
+
+
+	async def waitSlewComplete ( self, interval = 0.25 ):
+		# Resolve once the current goto has finished. All waiters share one low priority monitor, so any number
+		# of tasks can await slew completion while the mount sees a single 'L' every interval.
+		future = self._loop.create_future()
+		self._slewWaiters.append( future )
+
+		if self._slewMonitor is None or self._slewMonitor.done():
+			self._slewMonitor = asyncio.create_task( self._monitorSlew( interval ))
+
+		await future
+
+
+
+	async def _monitorSlew ( self, interval ):
+		# Waiters whose task was cancelled are dropped, the monitor stops once nobody waits
+		while True:
+			self._slewWaiters = [ waiter for waiter in self._slewWaiters if not waiter.done() ]
+			if not self._slewWaiters:
+				return
+
+			try:
+				reply = await self._exchange( b'L', REPLY_BOOL, 2, self.TIMEOUT_STATUS, priority = PRIORITY_MONITOR )
+			except ( MountTimeout, MountProtocolError ):
+				reply = b'1#'
+
+			if reply[0] == 0x30:
+				waiters, self._slewWaiters = self._slewWaiters, []
+				for waiter in waiters:
+					if not waiter.done():
+						waiter.set_result( True )
+				return
+
+			await asyncio.sleep( interval )
+
+
+
+	async def getGeoLocation ( self ):
+		return synscancodec.decodeLocation( await self._exchange( b'w', REPLY_8BYTES, 9, self.TIMEOUT_DEFAULT, binary = True ))
+
+	async def setGeoLocation ( self, geoCoords ):
+		self.longitude = geoCoords[0]
+		self.latitude = geoCoords[1]
+		self.site = None
+		await self._exchange( synscancodec.encodeLocation( self.longitude, self.latitude ), REPLY_ACK, 1, self.TIMEOUT_DEFAULT )
+
+	async def getTime ( self ):
+		return synscancodec.decodeTime( await self._exchange( b'h', REPLY_8BYTES, 9, self.TIMEOUT_DEFAULT, binary = True ))
+
+	async def getVersion ( self ):
+		return synscancodec.decodeVersion( await self._exchange( b'V', REPLY_VERSION, 7, self.TIMEOUT_DEFAULT ))
+
+	async def getModel ( self ):
+		return ( await self._exchange( b'm', REPLY_BYTE, 2, self.TIMEOUT_STATUS, binary = True ))[0]
+
+	async def echo ( self, echo ):
+		reply = await self._exchange( b'K' + str.encode( echo )[:1], REPLY_BYTE, 2, self.TIMEOUT_DEFAULT, binary = True )
+		return reply[:1].decode( 'latin-1' )
+
+	async def isAlignmentComplete ( self ):
+		reply = await self._exchange( b'J', REPLY_BYTE, 2, self.TIMEOUT_STATUS, binary = True )
+		self.alignmentCompleted = bool( reply[0] )
+		return self.alignmentCompleted
+
+	async def getMountPointingState ( self ):
+		reply = await self._exchange( b'p', REPLY_BYTE, 2, self.TIMEOUT_STATUS, binary = True )
+		return reply[:1].decode( 'latin-1' )
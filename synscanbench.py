@@ -0,0 +1,222 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import tracemalloc
+from time import perf_counter, thread_time
+
+from synscanserial import SynScanAZ
+
+
+# Single commands timed for round-trip latency, name -> function( mount )
+COMMANDS = {
+				"getRaDec"			: lambda mount: mount.getRaDec(),
+				"getRaDecPrecise"	: lambda mount: mount.getRaDecPrecise(),
+				"getAzmAltCoarse"	: lambda mount: mount.getAzmAltCoarse(),
+				"getAzmAltPrecise"	: lambda mount: mount.getAzmAltPrecise(),
+				"isSlewing"			: lambda mount: mount.isSlewing(),
+				"setTrackingMode"	: lambda mount: mount.setTrackingMode(0),
+				"getStatus"			: lambda mount: mount.getStatus(),
+			}
+
+# Full position polls, the same data the GUI paints, in coarse and precise mode
+POLLS = {
+			"coarse"		: lambda mount: ( mount.isSlewing(), mount.getAzmAltCoarse(), mount.getRaDec() ),
+			"precise"		: lambda mount: ( mount.isSlewing(), mount.getAzmAltPrecise(), mount.getRaDecPrecise() ),
+			"batchCoarse"	: lambda mount: mount.getStatus( precise = False ),
+			"batchPrecise"	: lambda mount: mount.getStatus(),
+		}
+
+
+
+def percentile ( samples, fraction ):
+	# Nearest-rank percentile of a sorted list
+	return samples[ min( len(samples) - 1, int( fraction * len(samples) )) ]
+
+
+
+def benchCommand ( mount, function, iterations ):
+	# Round-trip latency of one command, milliseconds
+	latencies = []
+	for i in range( iterations ):
+		start = perf_counter()
+		function( mount )
+		latencies.append( ( perf_counter() - start ) * 1000. )
+
+	latencies.sort()
+	return {
+				"n"			: iterations,
+				"mean_ms"	: sum( latencies ) / iterations,
+				"p50_ms"	: percentile( latencies, 0.50 ),
+				"p99_ms"	: percentile( latencies, 0.99 ),
+			}
+
+
+
+def benchPoll ( mount, function, duration ):
+	# Sustained poll rate and CPU time of this thread per poll
+	polls = 0
+	cpuStart = thread_time()
+	start = perf_counter()
+	while perf_counter() - start < duration:
+		function( mount )
+		polls += 1
+	elapsed = perf_counter() - start
+	cpu = thread_time() - cpuStart
+
+	# Separate pass for allocations, tracemalloc slows everything down
+	allocationPolls = max( 1, polls // 10 )
+	tracemalloc.start()
+	peak = 0
+	blocksStart = sys.getallocatedblocks()
+	for i in range( allocationPolls ):
+		tracemalloc.reset_peak()
+		current = tracemalloc.get_traced_memory()[0]
+		function( mount )
+		peak += tracemalloc.get_traced_memory()[1] - current
+	blocks = sys.getallocatedblocks() - blocksStart
+	tracemalloc.stop()
+
+	return {
+				"polls"					: polls,
+				"polls_per_s"			: polls / elapsed,
+				"cpu_us_per_poll"		: cpu / polls * 1e6,
+				"alloc_bytes_per_poll"	: peak / allocationPolls,
+				"net_blocks_per_poll"	: blocks / allocationPolls,
+			}
+
+
+
+def stress ( mount, threads = 8, iterations = 100 ):
+	# Hammer one mount from many threads. Every thread echoes its own character and checks the reply is its own,
+	# a status poller and a goto thread add longer exchanges in between. Returns a summary dict.
+	mismatches = []
+	errors = []
+	start = perf_counter()
+
+	def echoer ( char ):
+		for i in range( iterations ):
+			try:
+				reply = mount.echo( char )
+			except Exception as error:
+				errors.append( repr( error ))
+				continue
+			if reply != char:
+				mismatches.append( ( char, reply ))
+
+	def poller ( ):
+		for i in range( iterations ):
+			try:
+				status = mount.getStatus()
+			except Exception as error:
+				errors.append( repr( error ))
+				continue
+			if not isinstance( status.azm, float ):
+				mismatches.append( ( "status", status ))
+
+	def gotoer ( ):
+		for i in range( iterations // 10 ):
+			try:
+				mount.gotoAzmAltPrecise( [ i * 3., 20. ] )
+			except Exception as error:
+				errors.append( repr( error ))
+
+	workers = [ threading.Thread( target = echoer, args = ( chr( ord('a') + i ), )) for i in range( threads ) ]
+	workers += [ threading.Thread( target = poller ), threading.Thread( target = gotoer ) ]
+
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join()
+
+	return {
+				"threads"		: len( workers ),
+				"exchanges"		: threads * iterations + iterations + iterations // 10,
+				"seconds"		: perf_counter() - start,
+				"mismatches"	: len( mismatches ),
+				"errors"		: len( errors ),
+				"examples"		: [ repr( m ) for m in mismatches[:5] ] + errors[:5],
+			}
+
+
+
+def startSimulator ( baud ):
+	# Run the simulator in its own process so CPU and allocation numbers only cover SynScanAZ
+	process = subprocess.Popen( [ sys.executable, os.path.join( os.path.dirname( os.path.abspath( __file__ )), "synscansim.py" ), "--baud", str( baud ) ], stdout = subprocess.PIPE, text = True )
+	port = process.stdout.readline().strip()
+	return process, port
+
+
+
+def gitRevision ( ):
+	try:
+		return subprocess.check_output( [ "git", "rev-parse", "--short", "HEAD" ], stderr = subprocess.DEVNULL, text = True ).strip()
+	except Exception:
+		return None
+
+
+
+def run ( port = None, baud = 9600, iterations = 200, duration = 3., stressThreads = 0 ):
+	# Run the whole suite and return the results as a dict. With stressThreads only the stress test is run.
+	process = None
+	if port is None:
+		process, port = startSimulator( baud )
+
+	try:
+		# No read cache, every sample has to go over the wire
+		mount = SynScanAZ( port, cacheTtl = 0 )
+		if not mount.isConnected:
+			raise RuntimeError( "Cannot open " + port )
+
+		results = {
+					"revision"	: gitRevision(),
+					"python"	: sys.version.split()[0],
+					"port"		: port,
+					"baud"		: baud,
+					"commands"	: {},
+					"polls"		: {},
+				}
+
+		if stressThreads:
+			results["stress"] = stress( mount, stressThreads, iterations )
+			return results
+
+		for name, function in COMMANDS.items():
+			results["commands"][name] = benchCommand( mount, function, iterations )
+
+		for name, function in POLLS.items():
+			results["polls"][name] = benchPoll( mount, function, duration )
+
+		return results
+
+	finally:
+		if process is not None:
+			process.terminate()
+			process.wait()
+
+
+
+if __name__ == "__main__":
+	import argparse
+
+	parser = argparse.ArgumentParser( description = "SynScanAZ latency and poll rate benchmark" )
+	parser.add_argument( "--port", help = "serial port, default starts a local simulator" )
+	parser.add_argument( "--baud", type = int, default = 9600, help = "simulated line speed, 0 disables byte timing" )
+	parser.add_argument( "--iterations", type = int, default = 200, help = "samples per command" )
+	parser.add_argument( "--duration", type = float, default = 3., help = "seconds per sustained poll run" )
+	parser.add_argument( "--stress", type = int, default = 0, metavar = "THREADS", help = "run the concurrency stress test instead, exits nonzero on mismatched replies" )
+	parser.add_argument( "--output", help = "write JSON here instead of stdout" )
+	args = parser.parse_args()
+
+	results = run( args.port, args.baud, args.iterations, args.duration, args.stress )
+
+	if args.output:
+		with open( args.output, "w" ) as output:
+			json.dump( results, output, indent = 2 )
+	else:
+		json.dump( results, sys.stdout, indent = 2 )
+		print()
+
+	if args.stress and ( results["stress"]["mismatches"] or results["stress"]["errors"] ):
+		sys.exit( 1 )
@@ -0,0 +1,120 @@
+import tkinter as tk
+from collections import deque
+
+import numpy as np
+
+
+class StripChart ( object ):
+	"""Scrolling plot of tracking error on a Tk canvas.
+
+	Samples are decimated to one min/max line per pixel column and series, so drawing cost follows the
+	canvas width and not the sample count. New samples only redraw the columns they fall in, older
+	columns are scrolled with a single canvas move.
+	"""
+
+	def __init__ ( self, root, width = 480, height = 140, span = 600., scale = 60., series = ( ( "azm", "blue" ), ( "alt", "red" )) ):
+		# span is the visible history in seconds, scale the error in arcsec at the top and bottom edge
+		self.width = width
+		self.height = height
+		self.span = span
+		self.scale = scale
+		self.series = series
+		self.secondsPerColumn = span / width
+
+		self.canvas = tk.Canvas( root, width = width, height = height, bg = "white", highlightthickness = 0 )
+		self.canvas.create_line( 0, height // 2, width, height // 2, fill = "lightgrey" )
+		self.canvas.create_text( 2, 2, anchor = tk.NW, text = "+%g\""%scale, fill = "grey" )
+		self.canvas.create_text( 2, height - 2, anchor = tk.SW, text = "-%g\""%scale, fill = "grey" )
+		self.canvas.create_text( width - 2, 2, anchor = tk.NE, text = "  ".join( name for name, colour in series ), fill = "grey" )
+
+		self._columns = deque()				# ( column, { series : ( min, max ) }, [ canvas items ] ), oldest first
+		self._rightColumn = None			# Column drawn at the right edge
+
+
+
+	def grid ( self, **options ):
+		self.canvas.grid( **options )
+
+
+
+	def clear ( self ):
+		for column, extremes, items in self._columns:
+			for item in items:
+				self.canvas.delete( item )
+		self._columns.clear()
+		self._rightColumn = None
+
+
+
+	def update ( self, times, values ):
+		# Add samples. times in seconds, ascending, values { series : array } in arcsec. NaN values are skipped.
+		if len( times ) == 0:
+			return
+
+		columns = np.floor( np.asarray( times ) / self.secondsPerColumn ).astype( np.int64 )
+		starts = np.flatnonzero( np.r_[ True, columns[1:] != columns[:-1] ] )
+
+		extremes = {}
+		for name, colour in self.series:
+			data = np.asarray( values[name], dtype = float )
+			extremes[name] = ( np.fmin.reduceat( data, starts ), np.fmax.reduceat( data, starts ))
+
+		self._scroll( int( columns[-1] ))
+
+		for i, start in enumerate( starts ):
+			self._drawColumn( int( columns[start] ), { name : ( low[i], high[i] ) for name, ( low, high ) in extremes.items() } )
+
+
+
+	def _scroll ( self, column ):
+		# Move the plot left so column is at the right edge, dropping columns that fell off
+		if self._rightColumn is not None and column > self._rightColumn:
+			self.canvas.move( "data", -( column - self._rightColumn ), 0 )
+		if self._rightColumn is None or column > self._rightColumn:
+			self._rightColumn = column
+
+		while self._columns and self._columns[0][0] <= self._rightColumn - self.width:
+			for item in self._columns.popleft()[2]:
+				self.canvas.delete( item )
+
+
+
+	def _drawColumn ( self, column, extremes ):
+		x = self.width - 1 - ( self._rightColumn - column )
+		if x < 0:
+			return
+
+		# A column that already has samples is merged with the new ones and redrawn
+		if self._columns and self._columns[-1][0] == column:
+			_, previous, items = self._columns.pop()
+			for item in items:
+				self.canvas.delete( item )
+			extremes = { name : ( np.fmin( low, previous[name][0] ), np.fmax( high, previous[name][1] )) for name, ( low, high ) in extremes.items() }
+
+		items = []
+		for name, colour in self.series:
+			low, high = extremes[name]
+			if np.isnan( low ):
+				continue
+			items.append( self.canvas.create_line( x, self._y( high ), x, self._y( low ) + 1, fill = colour, tags = "data" ))
+
+		self._columns.append( ( column, extremes, items ))
+
+
+
+	def _y ( self, value ):
+		# Arcsec to canvas y, clipped to the canvas
+		half = self.height / 2.
+		return int( round( half - max( -1., min( 1., value / self.scale )) * ( half - 1 )) )
+
+
+
+def trackingError ( site, target, feed, samples ):
+	# Measured minus commanded position for an RA/Dec target, { "azm", "alt" } in arcsec on the sky, NaN while
+	# slewing. samples are TelemetryHistory columns. With a feed direction the commanded position is the
+	# siderostat mirror pointing.
+	commanded = site.trajectory( lambda unixTime: target, feed )( samples["timestamp"] )
+	slewing = samples["slewing"] != 0
+	azmError = ( ( samples["azm"] - commanded[0] + 180. ) % 360. - 180. ) * np.cos( np.radians( samples["alt"] )) * 3600.
+	altError = ( ( samples["alt"] - commanded[1] + 180. ) % 360. - 180. ) * 3600.
+	return { "azm" : np.where( slewing, np.nan, azmError ), "alt" : np.where( slewing, np.nan, altError ) }
@@ -0,0 +1,225 @@
+import re
+import struct
+import threading
+from collections import namedtuple
+
+
+# Every hand controller reply ends with this byte
+TERMINATOR = b'#'
+
+# Reply formats, used to validate a framed reply before it is decoded
+REPLY_ACK		= re.compile( b'#' )
+REPLY_16BIT		= re.compile( b'[0-9A-F]{4},[0-9A-F]{4}#' )
+REPLY_24BIT		= re.compile( b'[0-9A-F]{8},[0-9A-F]{8}#' )
+REPLY_BOOL		= re.compile( b'[01]#' )
+REPLY_BYTE		= re.compile( b'.#', re.DOTALL )
+REPLY_8BYTES	= re.compile( b'.{8}#', re.DOTALL )
+REPLY_VERSION	= re.compile( b'[0-9A-F]{6}#' )
+
+_HEX_DIGITS = b'0123456789ABCDEF'
+
+# Motor controller addresses and message ids for the 'P' passthrough command
+AXIS_AZM = 16
+AXIS_ALT = 17
+MC_GET_POSITION = 0x01
+MC_SET_POS_VARIABLE = 0x06
+MC_SET_NEG_VARIABLE = 0x07
+MC_MOVE_POS = 0x24
+MC_MOVE_NEG = 0x25
+MC_GET_VERSION = 0xFE
+
+# 'P' frame: command, length, destination, message id, three data bytes, reply length
+_PASSTHROUGH = struct.Struct( ">BBBB3sB" )
+
+# Passthrough replies by data length, binary data then '#'
+REPLY_PASSTHROUGH = [ re.compile( b'.{%d}#'%n, re.DOTALL ) for n in range( 4 ) ]
+
+# Variable rates are sent in quarter arcseconds per second in two bytes
+MAX_VARIABLE_RATE = 0xFFFF / 4.
+
+
+
+class PositionFormat ( object ):
+	"""Encoder and decoder for a pair of positions in the 16bit or 24bit hand controller format."""
+
+	def __init__ ( self, bits ):
+		self.bits = bits
+		self.counts = 1 << bits					# Counts per full rotation
+		self.scale = self.counts / 360.			# Counts per degree
+		self.digits = 4 if bits == 16 else 8	# 24bit values are sent as 8 digits, last two always 00
+		self.valueDigits = bits // 4			# Digits that carry the value
+
+		self.replyFormat = REPLY_16BIT if bits == 16 else REPLY_24BIT
+		self.replyLength = 2*self.digits + 2	# 'XXXX,XXXX#'
+
+		# Reusable command buffers 'cXXXX,XXXX' per thread, the command byte is filled in by encode()
+		self._local = threading.local()
+		self._second = 2 + self.digits
+
+
+
+	@property
+	def buffer ( self ):
+		# This thread's command buffer. The formats are shared by every SynScanAZ, one buffer per thread keeps
+		# several mounts encoding at the same time apart.
+		try:
+			return self._local.buffer
+		except AttributeError:
+			buffer = self._local.buffer = bytearray( b'0' * ( 2*self.digits + 2 ))
+			buffer[ 1 + self.digits ] = ord(',')
+			return buffer
+
+
+
+	def toCounts ( self, degrees ):
+		# Scale before rounding so sub-degree input keeps its full precision, wrap into one rotation
+		return int( round( float( degrees ) * self.scale )) % self.counts
+
+
+
+	def toDegrees ( self, counts ):
+		return counts / self.scale
+
+
+
+	def encode ( self, code, first, second ):
+		# Write command byte and both positions into the reusable buffer. Units, degrees.
+		buffer = self.buffer
+		buffer[0] = code
+		self._writeHex( buffer, 1, self.toCounts( first ))
+		self._writeHex( buffer, self._second, self.toCounts( second ))
+		return buffer
+
+
+
+	def decode ( self, reply ):
+		# Decode a validated 'XXXX,XXXX#' reply into [first, second] in degrees. Digits beyond the value width are discarded.
+		end = self.valueDigits
+		first = int( reply[ 0 : end ], 16 )
+		second = int( reply[ self.digits + 1 : self.digits + 1 + end ], 16 )
+		return [ first / self.scale, second / self.scale ]
+
+
+
+	def _writeHex ( self, buffer, offset, value ):
+		for i in range( offset + self.valueDigits - 1, offset - 1, -1 ):
+			buffer[i] = _HEX_DIGITS[ value & 0xF ]
+			value >>= 4
+
+
+
+FORMAT_16BIT = PositionFormat( 16 )
+FORMAT_24BIT = PositionFormat( 24 )
+
+
+# Precomputed command table, keyed by the SynScanAZ method that sends it
+Command = namedtuple( "Command", [ "code", "format", "query" ] )
+
+def _command ( char, positionFormat ):
+	return Command( ord(char), positionFormat, char.encode() )
+
+COMMANDS = {
+				"getRaDec"			: _command( 'E', FORMAT_16BIT ),
+				"getRaDecPrecise"	: _command( 'e', FORMAT_24BIT ),
+				"getAzmAltCoarse"	: _command( 'Z', FORMAT_16BIT ),
+				"getAzmAltPrecise"	: _command( 'z', FORMAT_24BIT ),
+				"gotoRaDecCoarse"	: _command( 'R', FORMAT_16BIT ),
+				"gotoRaDecPrecise"	: _command( 'r', FORMAT_24BIT ),
+				"gotoAzmAltCoarse"	: _command( 'B', FORMAT_16BIT ),
+				"gotoAzmAltPrecise"	: _command( 'b', FORMAT_24BIT ),
+				"syncRaDecCoarse"	: _command( 'S', FORMAT_16BIT ),
+				"syncRaDecPrecise"	: _command( 's', FORMAT_24BIT ),
+			}
+
+
+
+def encodePosition ( name, coords ):
+	# Build the command for a goto or sync. The returned buffer is reused by the next call with the same format on this thread.
+	command = COMMANDS[name]
+	return command.format.encode( command.code, coords[0], coords[1] )
+
+
+
+def decodePosition ( name, reply ):
+	# Decode the reply to a position query into [first, second] in degrees
+	return COMMANDS[name].format.decode( reply )
+
+
+
+def encodePassthrough ( axis, msgId, value = 0, size = 0, replyLength = 0 ):
+	# 8 byte 'P' frame for a motor controller message with a size byte big endian value and replyLength data bytes back
+	return _PASSTHROUGH.pack( 0x50, size + 1, axis, msgId, value.to_bytes( size, 'big' ), replyLength )
+
+
+
+def encodeVariableRate ( axis, positive, rate ):
+	# 'P' slew of one axis at a variable rate, units arcsec/sec
+	return encodePassthrough( axis, MC_SET_POS_VARIABLE if positive else MC_SET_NEG_VARIABLE, int( round( rate * 4 )), 2 )
+
+
+
+def encodeFixedRate ( axis, positive, rate ):
+	# 'P' slew of one axis at a hand controller rate 0-9, 0 stops the axis
+	return encodePassthrough( axis, MC_MOVE_POS if positive else MC_MOVE_NEG, rate, 1 )
+
+
+
+# Frames without arguments, built once
+POSITION_QUERIES = { axis : encodePassthrough( axis, MC_GET_POSITION, replyLength = 3 ) for axis in ( AXIS_AZM, AXIS_ALT ) }
+VERSION_QUERIES = { axis : encodePassthrough( axis, MC_GET_VERSION, replyLength = 2 ) for axis in ( AXIS_AZM, AXIS_ALT ) }
+
+
+
+def decodeAxisPosition ( reply ):
+	# 3 byte motor controller position, fraction of a full rotation, to degrees
+	return int.from_bytes( reply[0:3], 'big' ) / FORMAT_24BIT.scale
+
+
+
+def decodeVersion ( reply ):
+	# 'VVvvrr#' hand controller version reply to e.g. '4.37.07'
+	return "%d.%d.%02d"%( int( reply[0:2], 16 ), int( reply[2:4], 16 ), int( reply[4:6], 16 ))
+
+
+
+def _dms ( value ):
+	# Degrees to [degrees, minutes, seconds, sign] bytes as used by the location commands
+	sign = int( value < 0 )
+	value = abs( value )
+	d = int( value )
+	m = int( ( value - d ) * 60 )
+	s = int( round( ( value - d - m / 60. ) * 3600 ))
+	if s == 60:
+		m, s = m + 1, 0
+	if m == 60:
+		d, m = d + 1, 0
+	return [ d, m, s, sign ]
+
+
+
+def encodeLocation ( longitude, latitude ):
+	# 'W' command, latitude first as the hand controller expects. Units, degrees.
+	return b'W' + bytes( _dms( latitude ) + _dms( longitude ) )
+
+
+
+def decodeLocation ( reply ):
+	# 'w' reply to [longitude, latitude] in degrees
+	latitude = reply[0] + reply[1] / 60. + reply[2] / 3600.
+	longitude = reply[4] + reply[5] / 60. + reply[6] / 3600.
+
+	return [ -longitude if reply[7] else longitude, -latitude if reply[3] else latitude ]
+
+
+
+def encodeTime ( now ):
+	# 'H' command from a time.struct_time in local time
+	offset = now.tm_gmtoff // 3600 - ( now.tm_isdst > 0 )
+	return b'H' + bytes( ( now.tm_hour, now.tm_min, now.tm_sec, now.tm_mon, now.tm_mday, now.tm_year - 2000, offset % 256, int( now.tm_isdst > 0 ) ) )
+
+
+
+def decodeTime ( reply ):
+	# 'h' reply to [hour, minute, second, month, day, year, utc offset, dst]
+	offset = reply[6] - 256 if reply[6] > 127 else reply[6]
+	return [ reply[0], reply[1], reply[2], reply[3], reply[4], 2000 + reply[5], offset, reply[7] ]
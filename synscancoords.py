@@ -0,0 +1,135 @@
+import numpy as np
+from time import time
+
+
+# Mean sidereal rotation in degrees per day and the sidereal angle at J2000.0, see localSiderealTime
+SIDEREAL_DEGREES_PER_DAY = 360.98564736629
+SIDEREAL_AT_J2000 = 280.46061837
+J2000_UNIX_DAYS = 10957.5
+
+
+
+def localSiderealTime ( unixTime, longitude ):
+	# Local sidereal time in degrees for a unix time or an array of them, longitude positive east
+	days = np.asarray( unixTime, dtype = float ) / 86400. - J2000_UNIX_DAYS
+	return _scalar( ( SIDEREAL_AT_J2000 + SIDEREAL_DEGREES_PER_DAY * days + longitude ) % 360. )
+
+
+
+def _scalar ( value ):
+	# 0-d results go back as plain floats so single points read like the math module versions
+	return float( value ) if np.ndim( value ) == 0 else value
+
+
+
+def sunRaDec ( unixTime ):
+	# Low precision apparent Sun [ra, dec] in degrees, good to about 0.01 degrees within a century of J2000
+	days = np.asarray( unixTime, dtype = float ) / 86400. - J2000_UNIX_DAYS
+	meanLongitude = 280.460 + 0.9856474 * days
+	anomaly = np.radians( 357.528 + 0.9856003 * days )
+	longitude = np.radians( meanLongitude + 1.915 * np.sin( anomaly ) + 0.020 * np.sin( 2 * anomaly ))
+	obliquity = np.radians( 23.439 - 0.0000004 * days )
+
+	ra = np.degrees( np.arctan2( np.cos( obliquity ) * np.sin( longitude ), np.cos( longitude ))) % 360.
+	dec = np.degrees( np.arcsin( np.sin( obliquity ) * np.sin( longitude )))
+	return [ _scalar( ra ), _scalar( dec ) ]
+
+
+
+def mirrorNormal ( azm, alt, feedAzm = 0., feedAlt = 90. ):
+	# Siderostat mirror pointing [azm, alt] that reflects light arriving from the target direction [azm, alt]
+	# out along the feed direction [feedAzm, feedAlt]. The normal bisects the two directions. The default feed
+	# is straight up, where this reduces to the target azimuth at 90 - (90 - alt) / 2. Degrees, scalars or arrays.
+	azm, alt = np.radians( azm ), np.radians( alt )
+	feedAzm, feedAlt = np.radians( feedAzm ), np.radians( feedAlt )
+
+	# Sum of the unit vectors, x north, y east, z up
+	x = np.cos( alt )*np.cos( azm ) + np.cos( feedAlt )*np.cos( feedAzm )
+	y = np.cos( alt )*np.sin( azm ) + np.cos( feedAlt )*np.sin( feedAzm )
+	z = np.sin( alt ) + np.sin( feedAlt )
+
+	return [ _scalar( np.degrees( np.arctan2( y, x )) % 360. ), _scalar( np.degrees( np.arctan2( z, np.hypot( x, y )) )) ]
+
+
+
+class Site ( object ):
+	"""Observing site for local RA/Dec <-> Azm/Alt conversion of single points or arrays.
+
+	Same conventions as the mount: degrees everywhere, RA as a fraction of a full rotation, azimuth
+	from north towards east. No refraction and no alignment model, the hand controller applies its own.
+	"""
+
+	def __init__ ( self, latitude, longitude ):
+		self.latitude = float( latitude )
+		self.longitude = float( longitude )
+
+		lat = np.radians( self.latitude )
+		self._sinLat = np.sin( lat )
+		self._cosLat = np.cos( lat )
+
+
+
+	@classmethod
+	def fromMount ( cls, mount ):
+		# Site from the location last given to setGeoLocation, or read from the hand controller
+		if hasattr( mount, "latitude" ):
+			return cls( mount.latitude, mount.longitude )
+		longitude, latitude = mount.getGeoLocation()
+		return cls( latitude, longitude )
+
+
+
+	def lst ( self, unixTime = None ):
+		# Local sidereal time in degrees, now by default
+		return localSiderealTime( time() if unixTime is None else unixTime, self.longitude )
+
+
+
+	def toHorizontal ( self, ra, dec, lst = None ):
+		# [azm, alt] from [ra, dec]. lst in degrees, a scalar or an array matching ra, now by default.
+		ra, dec = np.asarray( ra, dtype = float ), np.asarray( dec, dtype = float )
+		h = np.radians( ( self.lst() if lst is None else lst ) - ra )
+		dec = np.radians( dec )
+
+		sinDec, cosDec = np.sin( dec ), np.cos( dec )
+		cosH = np.cos( h )
+
+		alt = np.arcsin( np.clip( sinDec*self._sinLat + cosDec*self._cosLat*cosH, -1., 1. ))
+		azm = np.arctan2( -cosDec*np.sin( h ), sinDec*self._cosLat - cosDec*self._sinLat*cosH )
+
+		return [ _scalar( np.degrees( azm ) % 360. ), _scalar( np.degrees( alt )) ]
+
+
+
+	def toEquatorial ( self, azm, alt, lst = None ):
+		# [ra, dec] from [azm, alt]. lst in degrees, a scalar or an array matching azm, now by default.
+		azm = np.radians( np.asarray( azm, dtype = float ))
+		alt = np.radians( np.asarray( alt, dtype = float ))
+
+		sinAlt, cosAlt = np.sin( alt ), np.cos( alt )
+		cosAzm = np.cos( azm )
+
+		dec = np.arcsin( np.clip( sinAlt*self._sinLat + cosAlt*self._cosLat*cosAzm, -1., 1. ))
+		h = np.arctan2( -np.sin( azm )*cosAlt, sinAlt*self._cosLat - cosAlt*self._sinLat*cosAzm )
+
+		return [ _scalar( ( ( self.lst() if lst is None else lst ) - np.degrees( h )) % 360. ), _scalar( np.degrees( dec )) ]
+
+
+
+	def mirrorPointing ( self, ra, dec, feed = ( 0., 90. ), lst = None ):
+		# Mirror [azm, alt] that sends light from [ra, dec] along the feed direction [azm, alt]
+		azm, alt = self.toHorizontal( ra, dec, lst )
+		return mirrorNormal( azm, alt, feed[0], feed[1] )
+
+
+
+	def trajectory ( self, raDec, feed = None ):
+		# Function of unix time giving the [azm, alt] to point at raDec( unixTime ), e.g. sunRaDec. With a feed
+		# direction it gives the siderostat mirror pointing instead.
+		def pointing ( unixTime ):
+			ra, dec = raDec( unixTime )
+			if feed is None:
+				return self.toHorizontal( ra, dec, self.lst( unixTime ))
+			return self.mirrorPointing( ra, dec, feed, self.lst( unixTime ))
+
+		return pointing
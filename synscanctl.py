@@ -1,284 +1,26 @@
 import re
-from  synscanserial import SynScanAZ
-import tkinter as tk
-from PIL import Image, ImageTk
-from copy import deepcopy
-from time import sleep
-import threading
-
-		
-class StatusWindow( object ):
-	"""Class for handling the graphical status and control window for SynscanAZ mount."""
-
-	def __init__ ( self, root ):
-		
-		self.mount = SynScanAZ()	
-
-		# Init GUI
-		self.root = root
-		self.root.title("SynScanAZ Control Window")
-
-		# labelList will contain handles to GUI labels
-		self.widget_list = []
-
-		# Graphics
-		self.art_path = "./art/151x151/"
-		self.art = [
-
-						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_left.png").convert("RGBA")),
-						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_up.png").convert("RGBA")),
-						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_down.png").convert("RGBA")),
-						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_right.png").convert("RGBA")),
-						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_left_on_click.png").convert("RGBA")),
-						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_up_on_click.png").convert("RGBA")),
-						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_down_on_click.png").convert("RGBA")),
-						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_right_on_click.png").convert("RGBA"))
-
-					]
-
-		# Arrow left, #0
-		widget_list_item = tk.Button(self.root, image = self.art[0], command = self.button_click_left )
-		widget_list_item.grid(row = 1, column = 0, columnspan = 2)
-		self.widget_list.append( widget_list_item )
-		
-		
-		# Arrow up, #1
-		widget_list_item = tk.Button( self.root, image = self.art[1], command = self.button_click_up )
-		widget_list_item.grid(row = 0, column = 2, columnspan = 2)
-		self.widget_list.append( widget_list_item )
-
-		
-		# Arrow down, #2
-		widget_list_item = tk.Button( self.root, image = self.art[2], command = self.button_click_down )
-		widget_list_item.grid(row = 1, column = 2, columnspan = 2)
-		self.widget_list.append( widget_list_item )
-
-		
-		# Arrow right, #3
-		widget_list_item = tk.Button(self.root, image = self.art[3], command = self.button_click_right )
-		widget_list_item.grid(row = 1, column = 4, columnspan = 2)
-		self.widget_list.append( widget_list_item )
+import sys
+import argparse
+from time import sleep, monotonic, time
 
-	
-		# Add text labels and append handles to the items needing updates to the widget_list
-		tk.Label(self.root, text = "Coordinates", height = 2).grid(row = 3, column = 0, columnspan = 6)
-
-
-		# Azimuth and altitude info
-		azm_alt = self.mount.getAzmAltPrecise()
-
-		tk.Label( self.root, text = "Azm.", height = 2, width = 10).grid(row = 4, column = 0 )
-		
-		widget_list_item = tk.Label( self.root, text = "%.4f"%azm_alt[0], relief = tk.RIDGE, bg = 'white', height = 2, width = 15 )
-		widget_list_item.grid( row = 4, column = 1, columnspan = 2 )
-		# #4
-		self.widget_list.append( widget_list_item )
-
-		tk.Label( self.root, text = "Alt.", height = 2, width = 10).grid(row = 4, column = 3 )
-		
-		widget_list_item = tk.Label( self.root, text = "%.4f"%azm_alt[1], relief = tk.RIDGE, bg = 'white', height = 2, width = 15 )
-		widget_list_item.grid( row = 4, column = 4, columnspan = 2 )
-		#5
-		self.widget_list.append( widget_list_item )
-
-	
-		# Right ascension and declination info
-		ra_dec = decimalCoordToPretty( self.mount.getRaDecPrecise() )
-
-		tk.Label( self.root, text = "RA", height = 2, width = 10).grid(row = 6, column = 0 )
-		
-		widget_list_item = tk.Label(self.root, text = ra_dec[0], relief = tk.RIDGE, bg = 'white', height = 2, width = 15 )
-		widget_list_item.grid( row = 6, column = 1, columnspan = 2 )
-		# #6
-		self.widget_list.append( widget_list_item )
-
-		tk.Label( self.root, text = "DEC", height = 2, width = 10).grid(row = 6, column = 3 )
-		
-		widget_list_item = tk.Label( self.root, text = ra_dec[1], relief = tk.RIDGE, bg = 'white', height = 2, width = 15 )
-		widget_list_item.grid( row = 6, column = 4, columnspan = 2 )
-		# #7	
-		self.widget_list.append( widget_list_item )
-
-
-		# Stop button and tracking status, #8
-		widget_list_item = tk.Button(self.root, relief = tk.RAISED, bg = 'red1', text = "STARTING...\n[stopped]", height = 4, width = 10, command = self.buttonStop )
-		widget_list_item.grid( row = 0, column = 4, columnspan = 2 )
-		self.widget_list.append( widget_list_item )
-
-
-		# Goto precision toggle, #9
-		widget_list_item = tk.Button(self.root, relief = tk.RAISED, bg = "lightgrey", text = "PRECISE\nGOTO", height = 4, width = 10, command = self.button_toggle_precision )
-		widget_list_item.grid( row = 0, column = 0, columnspan = 2 )
-		self.widget_list.append( widget_list_item )
-
-		# Vertical space
-		tk.Label(self.root, height = 1).grid(row = 7, column = 0, columnspan = 6)
-		
-		# GOTO Button right ascension + declination
-		widget_list_item = tk.Button( self.root, text = "GOTO RA/DEC", height = 2, width = 10, relief = tk.RAISED, command = self.buttonGotoRadec)
-		widget_list_item.grid( row = 9, column = 0 )
-		# #10
-		self.widget_list.append( widget_list_item )
-
-		# GOTO coordinates for right ascension, declination
-		widget_list_item = tk.Entry( self.root, bg = "white", width = 30, relief = tk.RIDGE)		
-		widget_list_item.grid( row = 9, column = 1, columnspan = 4 )
-		# #11	
-		self.widget_list.append( widget_list_item )
-		tk.Label(self.root, height = 2, text="hh:mm:ss.s\n+/-dd:mm:ss.s").grid(row = 9, column = 5)
-
-		# GOTO Button azimuth + altitude
-		widget_list_item = tk.Button( self.root, text = "GOTO Azm/Alt", height = 2, width = 10, relief = tk.RAISED, command = self.buttonGotoAzmAlt)
-		widget_list_item.grid( row = 10, column = 0 )
-		# #12
-		self.widget_list.append( widget_list_item )
-
-		# GOTO coordinates for azimuth and altitude
-		widget_list_item = tk.Entry( self.root, bg = "white", width = 30, relief = tk.RIDGE)		
-		widget_list_item.grid( row = 10, column = 1, columnspan = 4 )
-		# #13	
-		self.widget_list.append( widget_list_item )
-		tk.Label(self.root, height = 2, text="deg,deg").grid(row = 10, column = 5)
-
-		# Synchronize button
-		widget_list_item = tk.Button( self.root, text = "SYNC", height = 2, width = 10, relief = tk.RAISED, command = self.buttonSync)
-		widget_list_item.grid( row = 11, column = 0 )
-		# #14
-		self.widget_list.append( widget_list_item )
-
-		# Synchronize coordinate values
-		widget_list_item = tk.Entry( self.root, bg = "white", width = 30, relief = tk.RIDGE)		
-		widget_list_item.grid( row = 11, column = 1, columnspan = 4 )
-		# #15	
-		self.widget_list.append( widget_list_item )
-		tk.Label(self.root, height = 2, text="hh:mm:ss.s\n+/-dd:mm:ss.s").grid(row = 11, column = 5)
-
-		# Set tracking mode
-		tk.Label( self.root, height = 2, text = "Pointing Mode").grid( row = 12, column = 0)
-		widget_list_item = tk.Button( self.root, bg = "magenta1", text = "Telescope", width = 10, relief = tk.RAISED, command = self.buttonTelescope )		
-		widget_list_item.grid( row = 12, column = 1, columnspan = 2 )
-		# #16	
-		self.widget_list.append( widget_list_item )
-
-		widget_list_item = tk.Button( self.root, bg = "magenta1", text = "Mirror", width = 10, relief = tk.RAISED, command = self.buttonMirror )		
-		widget_list_item.grid( row = 12, column = 2, columnspan = 4 )
-		# #17	
-		self.widget_list.append( widget_list_item )
-
-
-	#def __del__ ( self ):
-	#	# Destructor, TODO better implementation with ctrl-C and 
-	#	self.root.destroy()
-
-
-
-	def refresh ( self ):
-		# Update the GUI
-
-		if self.mount.stepIsPrecise:
-			self.widget_list[9].configure(bg = "seagreen1")
-		else:
-			self.widget_list[9].configure(bg = "lightgrey")
-
-		if self.mount.isSlewing():
-			self.widget_list[8].configure(bg = "yellow", text = "READY\n[slewing]")
-		elif self.mount.trackingMode == 0:
-			self.widget_list[8].configure(bg = "red1", text = "READY\n[stopped]")
-		elif self.mount.trackingMode != 0:
-			self.widget_list[8].configure(bg = "seagreen1", text = "READY\n[tracking]")
-
-
-
-		azm_alt = self.mount.getAzmAltPrecise()
-		self.widget_list[4].configure(text = "%.4f"%azm_alt[0])
-		self.widget_list[5].configure(text = "%.4f"%azm_alt[1])
 
-		ra_dec = decimalCoordToPretty( self.mount.getRaDecPrecise() )
-		self.widget_list[6].configure(text = ra_dec[0])
-		self.widget_list[7].configure(text = ra_dec[1])
+# Names served from synscangui on first access, so importing this module for the coordinate helpers or the
+# command line never loads tkinter, PIL or the button art
+GUI_NAMES = ( "StatusWindow", "ViewModel", "DisplayCache", "JOG_DIRECTIONS", "KEY_REPEAT_GRACE",
+				"AZM_ALT_RESOLUTION", "RA_RESOLUTION", "DEC_RESOLUTION", "telemetryHistory", "localSite" )
 
+# Subcommands, a first argument that is none of these is the serial port of the control window
+COMMANDS = ( "status", "goto", "sync", "stop", "track", "gui" )
 
+DEFAULT_PORT = '/dev/ttyUSB0'
 
-	def button_click_left ( self ):
-		# Define button click
-		a = 1
 
 
-	def button_click_up ( self ):
-		# Define button click
-		a = 1
-
-	
-	def button_click_down ( self ):
-		# Define button click
-		a = 1
-
-
-	def button_click_right ( self ):
-		# Define button click
-		a = 1
-
-
-
-	def button_toggle_precision ( self ):
-		# Toggle between coarse and fine precision positioning
-		self.mount.togglePrecision()
-		if self.mount.stepIsPrecise == True:
-			self.widget_list[9].configure(bg = "seagreen1")
-		else:
-			self.widget_list[9].configure(bg = "lightgrey")
-
-
-	def buttonStop ( self ):
-		# Stop the mount
-		if self.mount.isSlewing():
-			self.mount.cancelGoto()
-
-		self.mount.setTrackingMode(0) # Sets mount to idle
-
-		if self.mount.isStopped():
-			self.widget_list[8].configure(bg = "red1", text = "READY\n[stopped]")
-
-
-	def buttonGotoRadec ( self ):
-		coordString = self.widget_list[11].get()	
-		self.mount.gotoRaDec( prettyCoordToDeg( coordString ) )
-		self.widget_list[11].delete(0,tk.END)
-
-
-	def buttonGotoAzmAlt ( self ):
-		coords = self.widget_list[13].get()
-		self.mount.gotoAzmAlt( re.split("[,]", coords) )
-		self.widget_list[13].delete(0,tk.END)
-
-
-	def buttonSync ( self ):
-		coords = self.widget_list[15].get()
-		self.mount.syncRaDec( prettyCoordToDec( coords ) )
-		self.widget_list[15].delete(0,tk.END)
-
-
-	def buttonTelescope ( self ):
-		self.mount.isTelescope = True
-		self.widget_list[16].configure(bg = "magenta1")
-		self.widget_list[17].configure(bg = "lightgrey")
-
-
-	def buttonMirror ( self ):
-		self.mount.isTelescope = False
-		self.widget_list[16].configure(bg = "lightgrey")
-		self.widget_list[17].configure(bg = "magenta1")
-
-
-
-	def updater ( self ):
-		if self.mount.isConnected:
-			self.refresh()
-			self.root.after( 500, self.updater )
-		else:
-			self.mount.reconnect()
-			print("Trying to reconnect in 10s")
-			self.root.after( 10000, self.updater )
+def __getattr__ ( name ):
+	if name in GUI_NAMES:
+		import synscangui
+		return getattr( synscangui, name )
+	raise AttributeError( "module %r has no attribute %r"%( __name__, name ))
 
 
 
@@ -370,19 +112,109 @@ def decimalCoordToPretty( coords ):
 
 
 
+# Headless command line. Only the serial layer is imported, numpy only for track --sun.
 
+def openMount ( port ):
+	from synscanserial import SynScanAZ
 
-if __name__ == "__main__":
-	import serial
-	import synscanctl as az
+	mount = SynScanAZ( port )
+	if not mount.isConnected:
+		sys.exit( "Could not open %s"%port )
+	return mount
+
+
+
+def parseAzmAlt ( text ):
+	# "azm,alt" in degrees
+	return [ float( value ) for value in re.split( "[,]", text ) ]
+
+
+
+def commandStatus ( mount, args ):
+	status = mount.getStatus()
+	if args.json:
+		import json
+		print( json.dumps( status._asdict() ))
+		return
+
+	ra, dec = decimalCoordToPretty( [ status.ra, status.dec ] )
+	print( "Slewing  %s"%( "yes" if status.isSlewing else "no" ))
+	print( "Azm/Alt  %.4f, %.4f"%( status.azm, status.alt ))
+	print( "RA/Dec   %s  %s"%( ra, dec ))
+
+
+
+def commandGoto ( mount, args ):
+	if args.mirror:
+		mount.isTelescope = False
+		if args.feed is not None:
+			mount.feed = parseAzmAlt( args.feed )
+
+	if args.azmalt:
+		mount.gotoAzmAlt( parseAzmAlt( args.target ))
+	else:
+		mount.gotoRaDec( prettyCoordToDeg( args.target ))
+
+	if args.wait:
+		start = monotonic()
+		while mount.isSlewing():
+			sleep( 0.25 )
+		print( "Arrived after %.1f s"%( monotonic() - start ))
+
+
+
+def commandSync ( mount, args ):
+	mount.syncRaDec( prettyCoordToDeg( args.target ))
+
+
+
+def commandStop ( mount, args ):
+	print( "Stopped in %.1f ms"%( mount.emergencyStop() * 1000. ))
+
+
+
+def commandTrack ( mount, args ):
+	if not args.sun:
+		if args.mode is None:
+			sys.exit( "track needs a MODE or --sun" )
+		mount.setTrackingMode( args.mode )
+		return
+
+	# Closed loop rate tracking of the Sun along the mirror feed, until the duration is over or Ctrl-C
+	from synscancoords import Site, sunRaDec
+	from synscantrack import RateTracker
+
+	if args.feed is not None:
+		mount.feed = parseAzmAlt( args.feed )
+	trajectory = Site.fromMount( mount ).trajectory( sunRaDec, feed = mount.feed )
+
+	# Slew to the start first, the tracker only removes a fraction of the error per cycle
+	mount.gotoAzmAlt( [ float( value ) for value in trajectory( time() ) ] )
+	while mount.isSlewing():
+		sleep( 0.25 )
+
+	tracker = RateTracker( mount, trajectory )
+	tracker.start()
+	try:
+		sleep( args.duration ) if args.duration else sleep( 1e9 )
+	except KeyboardInterrupt:
+		pass
+	finally:
+		tracker.stop()
+
+	azm, alt = tracker.rmsError()
+	print( "%d cycles, rms error %.1f\" azm %.1f\" alt"%( tracker.cycles, azm, alt ))
+
+
+
+def runGui ( port, localCoords = False ):
 	import tkinter as tk
-	from time import sleep
-	from sys import argv
+	import synscangui
 
 	root_window = tk.Tk()
 	root_window.resizable(width=False, height=False)
 	#root_window.bind('<Control-c>', quit)
-	win = az.StatusWindow(root_window)
+	win = synscangui.StatusWindow(root_window, port, localCoords)
 	
 	# while True:
 	# 	try:
@@ -393,3 +225,79 @@ if __name__ == "__main__":
 	# 		break
 	win.updater()
 	root_window.mainloop()
+
+
+
+def buildParser ( ):
+	common = argparse.ArgumentParser( add_help = False )
+	# --port goes before or after the command, SUPPRESS keeps a subcommand from resetting one given before it
+	common.add_argument( "--port", default = argparse.SUPPRESS, help = "serial port, e.g. the pty printed by synscansim.py" )
+	common.add_argument( "--precise", action = "store_true", help = "send positions in 24 bit" )
+
+	parser = argparse.ArgumentParser( description = "Control a SynScan AZ mount. Without a command the control window opens." )
+	parser.add_argument( "--port", default = DEFAULT_PORT, help = "serial port, e.g. the pty printed by synscansim.py" )
+	commands = parser.add_subparsers( dest = "command" )
+
+	status = commands.add_parser( "status", parents = [ common ], help = "print slew state and position" )
+	status.add_argument( "--json", action = "store_true" )
+
+	goto = commands.add_parser( "goto", parents = [ common ], help = "slew to a target" )
+	goto.add_argument( "target", help = "\"hh mm ss +dd mm ss\", or \"azm,alt\" in degrees with --azmalt" )
+	goto.add_argument( "--azmalt", action = "store_true" )
+	goto.add_argument( "--mirror", action = "store_true", help = "point the mirror normal, RA/Dec targets only" )
+	goto.add_argument( "--feed", help = "\"azm,alt\" the mirror sends light along, straight up by default" )
+	goto.add_argument( "--wait", action = "store_true", help = "return when the slew is over" )
+
+	sync = commands.add_parser( "sync", parents = [ common ], help = "sync the pointing to an RA/Dec" )
+	sync.add_argument( "target", help = "\"hh mm ss +dd mm ss\"" )
+
+	commands.add_parser( "stop", parents = [ common ], help = "emergency stop" )
+
+	track = commands.add_parser( "track", parents = [ common ], help = "set the tracking mode or rate track the Sun" )
+	track.add_argument( "mode", nargs = "?", type = int, choices = range( 4 ), help = "0 off, 1 Alt/Az, 2 equatorial, 3 PEC" )
+	track.add_argument( "--sun", action = "store_true", help = "rate track the Sun along the mirror feed" )
+	track.add_argument( "--feed", help = "\"azm,alt\" the mirror sends light along, straight up by default" )
+	track.add_argument( "--duration", type = float, default = 0., help = "seconds, 0 runs until Ctrl-C" )
+
+	gui = commands.add_parser( "gui", help = "open the control window" )
+	gui.add_argument( "--port", default = argparse.SUPPRESS )
+	gui.add_argument( "--local-coords", action = "store_true", help = "compute RA/Dec from Azm/Alt and this computer's clock, ignores syncs" )
+
+	return parser
+
+
+
+HANDLERS = {
+				"status"	: commandStatus,
+				"goto"		: commandGoto,
+				"sync"		: commandSync,
+				"stop"		: commandStop,
+				"track"		: commandTrack,
+			}
+
+
+
+def main ( argv ):
+	# Bare port or no arguments opens the control window as before
+	if not argv or ( argv[0] not in COMMANDS and not argv[0].startswith( "-" )):
+		runGui( argv[0] if argv else DEFAULT_PORT )
+		return
+
+	args = buildParser().parse_args( argv )
+	if args.command in ( None, "gui" ):
+		runGui( args.port, getattr( args, "local_coords", False ))
+		return
+
+	from synscanserial import MountError
+
+	mount = openMount( args.port )
+	mount.stepIsPrecise = args.precise
+	try:
+		HANDLERS[ args.command ]( mount, args )
+	except MountError as error:
+		sys.exit( "%s failed: %s"%( args.command, error ))
+
+
+
+if __name__ == "__main__":
+	main( sys.argv[1:] )
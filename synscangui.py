@@ -0,0 +1,435 @@
+import re
+from  synscanserial import SynScanAZ
+from synscanpoller import TelemetryPoller
+from synscancodec import AXIS_AZM, AXIS_ALT
+import tkinter as tk
+from PIL import Image, ImageTk
+from copy import deepcopy
+from time import sleep, time
+import threading
+
+from synscanctl import prettyCoordToDec, prettyCoordToDeg, decimalCoordToPretty
+
+
+# Arrow index to ( axis, direction ): left, up, down, right
+JOG_DIRECTIONS = ( ( AXIS_AZM, -1 ), ( AXIS_ALT, 1 ), ( AXIS_ALT, -1 ), ( AXIS_AZM, 1 ) )
+
+# Milliseconds a key release waits for an autorepeat press before it stops the axis
+KEY_REPEAT_GRACE = 40
+
+
+# Display precision in degrees: azm/alt as %.4f, RA to 0.01 s of time, Dec to 0.01 arcsec
+AZM_ALT_RESOLUTION = 1e-4
+RA_RESOLUTION = 0.01 * 15. / 3600.
+DEC_RESOLUTION = 0.01 / 3600.
+
+
+
+class ViewModel ( object ):
+	"""Last options given to each widget, so only widgets whose text, colour or image changed are configured."""
+
+	def __init__ ( self, widgets ):
+		self.widgets = widgets
+		self.rendered = {}
+
+	def configure ( self, index, **options ):
+		rendered = self.rendered.setdefault( index, {} )
+		changed = { key : value for key, value in options.items() if rendered.get( key, self ) != value }
+		if changed:
+			self.widgets[index].configure( **changed )
+			rendered.update( changed )
+
+
+
+class DisplayCache ( object ):
+	"""Formats values only when one of them changed at its display resolution, otherwise returns the last text."""
+
+	def __init__ ( self, format, *resolutions ):
+		self.format = format
+		self.resolutions = resolutions
+		self.key = None
+		self.text = None
+
+	def __call__ ( self, *values ):
+		key = tuple( round( value / resolution ) for value, resolution in zip( values, self.resolutions ))
+		if key != self.key:
+			self.key = key
+			self.text = self.format( *values )
+		return self.text
+
+
+		
+class StatusWindow( object ):
+	"""Class for handling the graphical status and control window for SynscanAZ mount."""
+
+	def __init__ ( self, root, port = '/dev/ttyUSB0', localCoords = False ):
+		
+		# The poller thread owns the serial port, the GUI only reads snapshots and queues jobs. With localCoords
+		# RA/Dec is computed from Azm/Alt and the PC clock, which ignores the hand controller alignment and syncs.
+		# The site is also used by the tracking error chart.
+		self.mount = SynScanAZ( port )
+		self.history = telemetryHistory()
+		self.site = localSite( self.mount )
+		self.poller = TelemetryPoller( self.mount, site = self.site if localCoords else None, history = self.history )
+
+		# Init GUI
+		self.root = root
+		self.root.title("SynScanAZ Control Window")
+
+		# labelList will contain handles to GUI labels
+		self.widget_list = []
+
+		# Widget updates go through the view model, coordinates are formatted only when the shown text changes
+		self.view = ViewModel( self.widget_list )
+		self.formatAzm = DisplayCache( lambda azm: "%.4f"%azm, AZM_ALT_RESOLUTION )
+		self.formatAlt = DisplayCache( lambda alt: "%.4f"%alt, AZM_ALT_RESOLUTION )
+		self.formatRaDec = DisplayCache( lambda ra, dec: decimalCoordToPretty( [ ra, dec ] ), RA_RESOLUTION, DEC_RESOLUTION )
+		self.painted = None
+
+		# Graphics
+		self.art_path = "./art/151x151/"
+		self.art = [
+
+						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_left.png").convert("RGBA")),
+						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_up.png").convert("RGBA")),
+						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_down.png").convert("RGBA")),
+						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_right.png").convert("RGBA")),
+						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_left_on_click.png").convert("RGBA")),
+						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_up_on_click.png").convert("RGBA")),
+						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_down_on_click.png").convert("RGBA")),
+						ImageTk.PhotoImage(Image.open(self.art_path + "arrow_right_on_click.png").convert("RGBA"))
+
+					]
+
+		# Arrow left, #0
+		widget_list_item = tk.Button(self.root, image = self.art[0] )
+		widget_list_item.grid(row = 1, column = 0, columnspan = 2)
+		self.widget_list.append( widget_list_item )
+		
+		
+		# Arrow up, #1
+		widget_list_item = tk.Button( self.root, image = self.art[1] )
+		widget_list_item.grid(row = 0, column = 2, columnspan = 2)
+		self.widget_list.append( widget_list_item )
+
+		
+		# Arrow down, #2
+		widget_list_item = tk.Button( self.root, image = self.art[2] )
+		widget_list_item.grid(row = 1, column = 2, columnspan = 2)
+		self.widget_list.append( widget_list_item )
+
+		
+		# Arrow right, #3
+		widget_list_item = tk.Button(self.root, image = self.art[3] )
+		widget_list_item.grid(row = 1, column = 4, columnspan = 2)
+		self.widget_list.append( widget_list_item )
+
+		# Press and hold jogging, the slew starts on press and stops on release. Arrow keys do the same.
+		for index, key in enumerate( ( "Left", "Up", "Down", "Right" ) ):
+			self.widget_list[index].bind( "<ButtonPress-1>", lambda event, index = index: self.jogPress( index ) )
+			self.widget_list[index].bind( "<ButtonRelease-1>", lambda event, index = index: self.jogRelease( index ) )
+			self.root.bind( "<KeyPress-%s>"%key, lambda event, index = index: self.jogKeyPress( index ) )
+			self.root.bind( "<KeyRelease-%s>"%key, lambda event, index = index: self.jogKeyRelease( index ) )
+
+		# Pending key release stops by arrow index, see jogKeyRelease, and the arrows whose key started a jog
+		self.keyReleases = {}
+		self.keyJogs = set()
+
+	
+		# Add text labels and append handles to the items needing updates to the widget_list
+		tk.Label(self.root, text = "Coordinates", height = 2).grid(row = 3, column = 0, columnspan = 6)
+
+
+		# Azimuth and altitude info, placeholder values until the first poll
+		snapshot = self.poller.latest()
+		azm_alt = [ snapshot.azm, snapshot.alt ]
+
+		tk.Label( self.root, text = "Azm.", height = 2, width = 10).grid(row = 4, column = 0 )
+		
+		widget_list_item = tk.Label( self.root, text = "%.4f"%azm_alt[0], relief = tk.RIDGE, bg = 'white', height = 2, width = 15 )
+		widget_list_item.grid( row = 4, column = 1, columnspan = 2 )
+		# #4
+		self.widget_list.append( widget_list_item )
+
+		tk.Label( self.root, text = "Alt.", height = 2, width = 10).grid(row = 4, column = 3 )
+		
+		widget_list_item = tk.Label( self.root, text = "%.4f"%azm_alt[1], relief = tk.RIDGE, bg = 'white', height = 2, width = 15 )
+		widget_list_item.grid( row = 4, column = 4, columnspan = 2 )
+		#5
+		self.widget_list.append( widget_list_item )
+
+	
+		# Right ascension and declination info
+		ra_dec = decimalCoordToPretty( [ snapshot.ra, snapshot.dec ] )
+
+		tk.Label( self.root, text = "RA", height = 2, width = 10).grid(row = 6, column = 0 )
+		
+		widget_list_item = tk.Label(self.root, text = ra_dec[0], relief = tk.RIDGE, bg = 'white', height = 2, width = 15 )
+		widget_list_item.grid( row = 6, column = 1, columnspan = 2 )
+		# #6
+		self.widget_list.append( widget_list_item )
+
+		tk.Label( self.root, text = "DEC", height = 2, width = 10).grid(row = 6, column = 3 )
+		
+		widget_list_item = tk.Label( self.root, text = ra_dec[1], relief = tk.RIDGE, bg = 'white', height = 2, width = 15 )
+		widget_list_item.grid( row = 6, column = 4, columnspan = 2 )
+		# #7	
+		self.widget_list.append( widget_list_item )
+
+
+		# Stop button and tracking status, #8
+		widget_list_item = tk.Button(self.root, relief = tk.RAISED, bg = 'red1', text = "STARTING...\n[stopped]", height = 4, width = 10, command = self.buttonStop )
+		widget_list_item.grid( row = 0, column = 4, columnspan = 2 )
+		self.widget_list.append( widget_list_item )
+
+
+		# Goto precision toggle, #9
+		widget_list_item = tk.Button(self.root, relief = tk.RAISED, bg = "lightgrey", text = "PRECISE\nGOTO", height = 4, width = 10, command = self.button_toggle_precision )
+		widget_list_item.grid( row = 0, column = 0, columnspan = 2 )
+		self.widget_list.append( widget_list_item )
+
+		# Vertical space
+		tk.Label(self.root, height = 1).grid(row = 7, column = 0, columnspan = 6)
+		
+		# GOTO Button right ascension + declination
+		widget_list_item = tk.Button( self.root, text = "GOTO RA/DEC", height = 2, width = 10, relief = tk.RAISED, command = self.buttonGotoRadec)
+		widget_list_item.grid( row = 9, column = 0 )
+		# #10
+		self.widget_list.append( widget_list_item )
+
+		# GOTO coordinates for right ascension, declination
+		widget_list_item = tk.Entry( self.root, bg = "white", width = 30, relief = tk.RIDGE)		
+		widget_list_item.grid( row = 9, column = 1, columnspan = 4 )
+		# #11	
+		self.widget_list.append( widget_list_item )
+		tk.Label(self.root, height = 2, text="hh:mm:ss.s\n+/-dd:mm:ss.s").grid(row = 9, column = 5)
+
+		# GOTO Button azimuth + altitude
+		widget_list_item = tk.Button( self.root, text = "GOTO Azm/Alt", height = 2, width = 10, relief = tk.RAISED, command = self.buttonGotoAzmAlt)
+		widget_list_item.grid( row = 10, column = 0 )
+		# #12
+		self.widget_list.append( widget_list_item )
+
+		# GOTO coordinates for azimuth and altitude
+		widget_list_item = tk.Entry( self.root, bg = "white", width = 30, relief = tk.RIDGE)		
+		widget_list_item.grid( row = 10, column = 1, columnspan = 4 )
+		# #13	
+		self.widget_list.append( widget_list_item )
+		tk.Label(self.root, height = 2, text="deg,deg").grid(row = 10, column = 5)
+
+		# Synchronize button
+		widget_list_item = tk.Button( self.root, text = "SYNC", height = 2, width = 10, relief = tk.RAISED, command = self.buttonSync)
+		widget_list_item.grid( row = 11, column = 0 )
+		# #14
+		self.widget_list.append( widget_list_item )
+
+		# Synchronize coordinate values
+		widget_list_item = tk.Entry( self.root, bg = "white", width = 30, relief = tk.RIDGE)		
+		widget_list_item.grid( row = 11, column = 1, columnspan = 4 )
+		# #15	
+		self.widget_list.append( widget_list_item )
+		tk.Label(self.root, height = 2, text="hh:mm:ss.s\n+/-dd:mm:ss.s").grid(row = 11, column = 5)
+
+		# Set tracking mode
+		tk.Label( self.root, height = 2, text = "Pointing Mode").grid( row = 12, column = 0)
+		widget_list_item = tk.Button( self.root, bg = "magenta1", text = "Telescope", width = 10, relief = tk.RAISED, command = self.buttonTelescope )		
+		widget_list_item.grid( row = 12, column = 1, columnspan = 2 )
+		# #16	
+		self.widget_list.append( widget_list_item )
+
+		widget_list_item = tk.Button( self.root, bg = "magenta1", text = "Mirror", width = 10, relief = tk.RAISED, command = self.buttonMirror )		
+		widget_list_item.grid( row = 12, column = 2, columnspan = 4 )
+		# #17	
+		self.widget_list.append( widget_list_item )
+
+		# Jog rate, hand controller rates 1-9
+		tk.Label( self.root, height = 2, text = "Jog rate").grid( row = 2, column = 0, columnspan = 2 )
+		widget_list_item = tk.Spinbox( self.root, from_ = 1, to = 9, width = 5, bg = "white" )
+		widget_list_item.delete( 0, tk.END )
+		widget_list_item.insert( 0, "5" )
+		widget_list_item.grid( row = 2, column = 2, columnspan = 2 )
+		# #18
+		self.widget_list.append( widget_list_item )
+
+		# Tracking error of the last RA/Dec goto target, needs numpy and the site location
+		self.chart = None
+		self.chartTarget = None
+		self.chartFeed = None
+		self.chartSince = 0.
+		if self.history is not None and self.site is not None:
+			from synscanchart import StripChart
+			tk.Label( self.root, height = 2, text = "Tracking error, last 10 min").grid( row = 13, column = 0, columnspan = 6 )
+			self.chart = StripChart( self.root )
+			self.chart.grid( row = 14, column = 0, columnspan = 6 )
+
+		self.poller.start()
+
+
+	#def __del__ ( self ):
+	#	# Destructor, TODO better implementation with ctrl-C and 
+	#	self.root.destroy()
+
+
+
+	def refresh ( self, snapshot ):
+		# Update the GUI from a poller snapshot, no serial I/O here. The view model only passes on changes.
+
+		if self.mount.stepIsPrecise:
+			self.view.configure(9, bg = "seagreen1")
+		else:
+			self.view.configure(9, bg = "lightgrey")
+
+		if snapshot.isSlewing:
+			self.view.configure(8, bg = "yellow", text = "READY\n[slewing]")
+		elif snapshot.trackingMode == 0:
+			self.view.configure(8, bg = "red1", text = "READY\n[stopped]")
+		elif snapshot.trackingMode != 0:
+			self.view.configure(8, bg = "seagreen1", text = "READY\n[tracking]")
+
+
+
+		self.view.configure(4, text = self.formatAzm( snapshot.azm ))
+		self.view.configure(5, text = self.formatAlt( snapshot.alt ))
+
+		ra_dec = self.formatRaDec( snapshot.ra, snapshot.dec )
+		self.view.configure(6, text = ra_dec[0])
+		self.view.configure(7, text = ra_dec[1])
+
+
+
+	def jogPress ( self, index ):
+		# Start slewing one axis for arrow index 0-3 at the selected jog rate
+		axis, direction = JOG_DIRECTIONS[index]
+		self.view.configure( index, image = self.art[ index + 4 ] )
+		self.poller.jog( axis, direction * int( self.widget_list[18].get() ))
+
+
+	def jogRelease ( self, index ):
+		# Stop the axis, queued ahead of gotos and polls
+		axis, direction = JOG_DIRECTIONS[index]
+		self.view.configure( index, image = self.art[index] )
+		self.poller.jog( axis, 0 )
+
+
+	def jogKeyPress ( self, index ):
+		# Key autorepeat sends release and press pairs, a press right after a release cancels its stop
+		pending = self.keyReleases.pop( index, None )
+		if pending is not None:
+			self.root.after_cancel( pending )
+		elif not isinstance( self.root.focus_get(), ( tk.Entry, tk.Spinbox )):
+			self.keyJogs.add( index )
+			self.jogPress( index )
+
+
+	def jogKeyRelease ( self, index ):
+		# Only keys that started a jog stop one, arrows moving the cursor in an entry leave the mount alone
+		if index in self.keyReleases or index not in self.keyJogs:
+			return
+		self.keyReleases[index] = self.root.after( KEY_REPEAT_GRACE, self._jogKeyStop, index )
+
+
+	def _jogKeyStop ( self, index ):
+		del self.keyReleases[index]
+		self.keyJogs.discard( index )
+		self.jogRelease( index )
+
+
+
+	def button_toggle_precision ( self ):
+		# Toggle between coarse and fine precision positioning
+		self.mount.togglePrecision()
+		if self.mount.stepIsPrecise == True:
+			self.view.configure(9, bg = "seagreen1")
+		else:
+			self.view.configure(9, bg = "lightgrey")
+
+
+	def buttonStop ( self ):
+		# Emergency stop, preempts the poller and drops queued gotos. The stop latency is printed.
+		self.poller.stop()
+
+
+	def buttonGotoRadec ( self ):
+		coordString = self.widget_list[11].get()	
+		coords = prettyCoordToDeg( coordString )
+		self.poller.goto( SynScanAZ.gotoRaDec, coords )
+		self.widget_list[11].delete(0,tk.END)
+
+		# Plot tracking error against the new target from now on
+		if self.chart is not None:
+			self.chartTarget = coords
+			self.chartFeed = None if self.mount.isTelescope else list( self.mount.feed )
+			self.chartSince = time()
+			self.chart.clear()
+
+
+	def buttonGotoAzmAlt ( self ):
+		coords = self.widget_list[13].get()
+		self.poller.goto( SynScanAZ.gotoAzmAlt, re.split("[,]", coords) )
+		self.widget_list[13].delete(0,tk.END)
+
+
+	def buttonSync ( self ):
+		coords = self.widget_list[15].get()
+		self.poller.submit( SynScanAZ.syncRaDec, prettyCoordToDec( coords ) )
+		self.widget_list[15].delete(0,tk.END)
+
+
+	def buttonTelescope ( self ):
+		self.mount.isTelescope = True
+		self.view.configure(16, bg = "magenta1")
+		self.view.configure(17, bg = "lightgrey")
+
+
+	def buttonMirror ( self ):
+		self.mount.isTelescope = False
+		self.view.configure(16, bg = "lightgrey")
+		self.view.configure(17, bg = "magenta1")
+
+
+
+	def updater ( self ):
+		# Paint the newest snapshot, poll rate and reconnection are decided by the poller thread.
+		# Draining the queue is cheap, the short period only makes fast slew updates show up on time.
+		snapshot = self.poller.latest()
+		if snapshot.isConnected and snapshot is not self.painted:
+			self.refresh( snapshot )
+			self.painted = snapshot
+		self.updateChart()
+		self.root.after( 100, self.updater )
+
+
+
+	def updateChart ( self ):
+		# Feed the samples recorded since the last call to the strip chart, slews are left out
+		if self.chart is None or self.chartTarget is None:
+			return
+
+		from synscanchart import trackingError
+
+		for segment in self.history.segments( since = self.chartSince ):
+			self.chart.update( segment["timestamp"], trackingError( self.site, self.chartTarget, self.chartFeed, segment ))
+			self.chartSince = segment["timestamp"][-1] + 1e-6
+
+
+
+def telemetryHistory ( ):
+	# In-memory position history for the tracking error chart, None without numpy
+	try:
+		from synscanhistory import TelemetryHistory
+	except ImportError:
+		return None
+	return TelemetryHistory( 36000 )
+
+
+
+def localSite ( mount ):
+	# Site for the tracking error chart and optional local RA/Dec, None without numpy or a location
+	if not mount.isConnected:
+		return None
+	try:
+		from synscancoords import Site
+		return Site.fromMount( mount )
+	except Exception as error:
+		print("Reading RA/Dec from the mount: %s"%error)
+		return None
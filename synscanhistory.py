@@ -0,0 +1,161 @@
+import os
+import numpy as np
+from time import time
+
+
+# Columns kept per sample, in file order
+COLUMNS = (
+				( "timestamp"	, np.float64 ),	# unix time
+				( "azm"			, np.float64 ),	# degrees
+				( "alt"			, np.float64 ),
+				( "ra"			, np.float64 ),
+				( "dec"			, np.float64 ),
+				( "slewing"		, np.uint8 ),
+			)
+
+# Backing file header: magic, capacity, samples appended in total
+MAGIC = b'SSHIST01'
+HEADER = np.dtype( [ ( "magic", "S8" ), ( "capacity", "<i8" ), ( "count", "<i8" ) ] )
+
+
+
+class TelemetryHistory ( object ):
+	"""Fixed-capacity columnar ring buffer of mount samples, 41 bytes per sample whatever the run time.
+
+	With a path the columns live in a memory-mapped file that is reopened on the next start, so a crash
+	keeps the history. Views returned by segments() share memory with the buffer and are overwritten as
+	it wraps, copy what has to outlive the next capacity appends.
+	"""
+
+	def __init__ ( self, capacity = 86400, path = None ):
+		# An existing history file is reopened with the capacity it was created with, whatever capacity says.
+		# Any other non-empty file at path raises ValueError rather than being overwritten.
+		self.path = path
+		exists = path is not None and os.path.exists( path ) and os.path.getsize( path ) > 0
+		if exists:
+			capacity = _storedCapacity( path )
+
+		offsets, size = _layout( capacity )
+
+		if path is None:
+			self._storage = np.zeros( size, dtype = np.uint8 )
+		else:
+			self._storage = np.memmap( path, dtype = np.uint8, mode = "r+" if exists else "w+", shape = ( size, ))
+
+		self._header = self._storage[ : HEADER.itemsize ].view( HEADER )
+		if not exists:
+			# New buffer, start empty
+			self._header["magic"] = MAGIC
+			self._header["capacity"] = capacity
+			self._header["count"] = 0
+
+		self.capacity = capacity
+		self.columns = {}
+		for ( name, dtype ), offset in zip( COLUMNS, offsets ):
+			self.columns[name] = self._storage[ offset : offset + capacity * np.dtype( dtype ).itemsize ].view( dtype )
+
+
+
+	@property
+	def count ( self ):
+		# Samples appended since the buffer was created, including overwritten ones
+		return int( self._header["count"][0] )
+
+
+
+	def __len__ ( self ):
+		return min( self.count, self.capacity )
+
+
+
+	def append ( self, timestamp, azm, alt, ra, dec, slewing ):
+		# O(1), the count is bumped last so a crash mid-append leaves the previous sample as the newest
+		count = self.count
+		index = count % self.capacity
+		columns = self.columns
+		columns["timestamp"][index] = timestamp
+		columns["azm"][index] = azm
+		columns["alt"][index] = alt
+		columns["ra"][index] = ra
+		columns["dec"][index] = dec
+		columns["slewing"][index] = slewing
+		self._header["count"] = count + 1
+
+
+
+	def appendSnapshot ( self, snapshot ):
+		# Sample from a poller MountSnapshot, stamped with the wall clock so files stay usable across restarts
+		self.append( time(), snapshot.azm, snapshot.alt, snapshot.ra, snapshot.dec, snapshot.isSlewing )
+
+
+
+	def segments ( self, last = None, since = None ):
+		# Zero-copy views of the newest samples in time order, as a list of at most two { column : array }
+		# since the ring may wrap. last limits the number of samples, since to unix times at or after it.
+		size = len( self )
+		if last is not None:
+			size = min( size, last )
+		end = self.count % self.capacity if self.count > self.capacity else self.count
+		start = end - size
+
+		if start >= 0:
+			ranges = [ ( start, end ) ]
+		else:
+			ranges = [ ( self.capacity + start, self.capacity ), ( 0, end ) ]
+
+		segments = [ { name : column[ first : stop ] for name, column in self.columns.items() } for first, stop in ranges if stop > first ]
+
+		if since is not None:
+			segments = [ _since( segment, since ) for segment in segments ]
+			segments = [ segment for segment in segments if len( segment["timestamp"] ) ]
+
+		return segments
+
+
+
+	def window ( self, last = None, since = None ):
+		# The same samples as segments() as one { column : array }. A view when the window does not wrap, else a copy.
+		segments = self.segments( last, since )
+		if not segments:
+			return { name : column[ 0 : 0 ] for name, column in self.columns.items() }
+		if len( segments ) == 1:
+			return segments[0]
+		return { name : np.concatenate( [ segment[name] for segment in segments ] ) for name in self.columns }
+
+
+
+	def flush ( self ):
+		# Push a memory-mapped buffer to disk, the OS does so eventually anyway
+		if self.path is not None:
+			self._storage.flush()
+
+
+
+def _layout ( capacity ):
+	# Byte offset of every column and the total size of a buffer holding capacity samples
+	offsets = []
+	size = HEADER.itemsize
+	for name, dtype in COLUMNS:
+		offsets.append( size )
+		size += capacity * np.dtype( dtype ).itemsize
+	return offsets, size
+
+
+
+def _storedCapacity ( path ):
+	# Capacity of an existing history file, checked against its header and size
+	fileSize = os.path.getsize( path )
+	header = np.fromfile( path, dtype = HEADER, count = 1 ) if fileSize >= HEADER.itemsize else None
+	if header is None or header["magic"][0] != MAGIC:
+		raise ValueError( "%s exists and is not a telemetry history"%path )
+
+	capacity = int( header["capacity"][0] )
+	if capacity <= 0 or _layout( capacity )[1] != fileSize:
+		raise ValueError( "%s is a damaged telemetry history, size does not match capacity %d"%( path, capacity ))
+	return capacity
+
+
+
+def _since ( segment, since ):
+	first = int( np.searchsorted( segment["timestamp"], since ))
+	return { name : column[ first : ] for name, column in segment.items() }
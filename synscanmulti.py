@@ -0,0 +1,136 @@
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from serial.tools import list_ports
+
+from synscanserial import SynScanAZ, MountError
+
+
+# Outcome of one call on one mount. error is None or the exception, latency in seconds.
+MountReply = namedtuple( "MountReply", [ "value", "error", "latency" ] )
+
+# Result of a coordinated goto: per-mount replies and the spread of the moments the commands went out, seconds
+GotoReport = namedtuple( "GotoReport", [ "replies", "startSpread" ] )
+
+
+
+def probePort ( device ):
+	# Open a port and ask for the hand controller version. Returns the version string or None.
+	mount = SynScanAZ( device, cacheTtl = 0 )
+	if not mount.isConnected:
+		return None
+
+	try:
+		return mount.getVersion()
+	except MountError:
+		return None
+	finally:
+		mount.ser.close()
+
+
+
+def discoverPorts ( ):
+	# Serial ports with a SynScan hand controller answering, probed concurrently. Returns { device : version }.
+	devices = [ port.device for port in list_ports.comports() ]
+	if not devices:
+		return {}
+
+	with ThreadPoolExecutor( max_workers = len( devices )) as pool:
+		versions = pool.map( probePort, devices )
+
+	return { device : version for device, version in zip( devices, versions ) if version is not None }
+
+
+
+class MountManager ( object ):
+	"""Owns several SynScanAZ connections and fans calls out to all of them at once on a thread pool."""
+
+	def __init__ ( self, ports = None, cacheTtl = 0.1 ):
+		# ports is a list of devices, None discovers them
+		if ports is None:
+			ports = sorted( discoverPorts() )
+
+		self.mounts = { port : SynScanAZ( port, cacheTtl ) for port in ports }
+		self.pool = ThreadPoolExecutor( max_workers = max( 1, len( self.mounts )), thread_name_prefix = "MountManager" )
+
+
+
+	def __enter__ ( self ):
+		return self
+
+	def __exit__ ( self, *exc ):
+		self.close()
+
+
+
+	def close ( self ):
+		self.pool.shutdown()
+		for mount in self.mounts.values():
+			if mount.isConnected:
+				mount.ser.close()
+
+
+
+	def map ( self, function, *args, ports = None ):
+		# Call function( mount, *args ) on every mount concurrently. Returns { port : MountReply }.
+		ports = list( self.mounts ) if ports is None else ports
+		futures = { port : self.pool.submit( _timed, function, self.mounts[port], args ) for port in ports }
+		return { port : future.result() for port, future in futures.items() }
+
+
+
+	def status ( self, precise = True ):
+		# Batched status of every mount with its round-trip latency. Returns { port : MountReply( MountStatus, ... ) }.
+		return self.map( SynScanAZ.getStatus, precise )
+
+
+
+	def goto ( self, targets, method = SynScanAZ.gotoAzmAlt ):
+		# Coordinated goto. targets is { port : coords }, or one coords for every mount. For gotoAzmAlt and gotoRaDec
+		# every worker encodes its command, mirror pointing included, then all meet at a barrier so the commands
+		# leave together instead of one mount after another. Other methods run whole after the barrier.
+		if not isinstance( targets, dict ):
+			targets = { port : targets for port in self.mounts }
+
+		barrier = threading.Barrier( len( targets ))
+		started = {}
+		raDec = { SynScanAZ.gotoAzmAlt : False, SynScanAZ.gotoRaDec : True }.get( method )
+
+		def coordinated ( mount, port, coords ):
+			cmd = None
+			if raDec is not None:
+				try:
+					cmd = mount.gotoCommand( coords, raDec )
+				finally:
+					# A failed encode still releases the others
+					if cmd is None:
+						barrier.abort()
+			try:
+				barrier.wait( timeout = 5. )
+			except threading.BrokenBarrierError:
+				pass
+			started[port] = perf_counter()
+			return method( mount, coords ) if cmd is None else mount.sendGoto( cmd )
+
+		futures = { port : self.pool.submit( _timed, coordinated, self.mounts[port], ( port, coords )) for port, coords in targets.items() }
+		replies = { port : future.result() for port, future in futures.items() }
+
+		return GotoReport( replies, max( started.values() ) - min( started.values() ) if started else 0. )
+
+
+
+	def stop ( self ):
+		# Emergency stop every mount at once. Returns { port : MountReply( stop latency, ... ) }.
+		return self.map( SynScanAZ.emergencyStop )
+
+
+
+def _timed ( function, mount, args ):
+	start = perf_counter()
+	try:
+		value = function( mount, *args )
+	except MountError as error:
+		return MountReply( None, error, perf_counter() - start )
+	return MountReply( value, None, perf_counter() - start )
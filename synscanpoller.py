@@ -0,0 +1,442 @@
+import itertools
+import queue
+import threading
+from collections import namedtuple
+from time import monotonic
+
+
+# Immutable snapshot of everything the GUI paints. Published by the poller thread only.
+MountSnapshot = namedtuple( "MountSnapshot", [
+									"timestamp"		,	# monotonic() at the end of the poll
+									"isConnected"	,
+									"isSlewing"		,
+									"trackingMode"	,
+									"stepIsPrecise"	,
+									"azm"			,	# degrees
+									"alt"			,	# degrees
+									"ra"			,	# degrees, fraction of full rotation
+									"dec"			,	# degrees
+								] )
+
+
+# Job priorities, lower number runs first
+PRIORITY_STOP = 0
+PRIORITY_GOTO = 1
+PRIORITY_NORMAL = 2
+
+# Mount states the poll schedule is chosen by
+STATE_SLEWING = "slewing"
+STATE_TRACKING = "tracking"
+STATE_STOPPED = "stopped"
+
+# Bytes on the wire per status field, command plus precise reply
+FIELD_BYTES = { "isSlewing" : 3, "azmAlt" : 19, "raDec" : 19 }
+
+# Bytes on the wire for a coarse position read, and its resolution in degrees
+COARSE_BYTES = 11
+COARSE_RESOLUTION = 360. / 65536
+
+# Seconds between reads of each field per mount state. Fields are listed by priority, the budget is
+# taken from the end of the list first.
+DEFAULT_PERIODS = {
+						STATE_SLEWING	: ( ( "isSlewing", 0.1 ), ( "azmAlt", 0.2 ), ( "raDec", 1. ) ),
+						STATE_TRACKING	: ( ( "isSlewing", 2. ), ( "raDec", 0.5 ), ( "azmAlt", 0.5 ) ),
+						STATE_STOPPED	: ( ( "isSlewing", 5. ), ( "azmAlt", 5. ), ( "raDec", 10. ) ),
+					}
+
+
+class PollScheduler ( object ):
+	"""Decides when the poller reads which status field, from the mount state and a bytes per second budget."""
+
+	def __init__ ( self, trackingInterval = 0.5, budget = 480., reconnectMin = 1., reconnectMax = 30., periods = DEFAULT_PERIODS, coarseSpeed = 0.5 ):
+		# budget is in bytes per second, 480 leaves half of a 9600 baud link for commands.
+		# Position fields moving faster than coarseSpeed degrees per second during a slew are read in 16bit.
+		self.budget = budget
+		self.coarseSpeed = coarseSpeed
+		self.reconnectMin = reconnectMin
+		self.reconnectMax = reconnectMax
+		self.reconnectDelay = reconnectMin
+
+		periods = dict( periods )
+		periods[STATE_TRACKING] = tuple( ( field, trackingInterval if field != "isSlewing" else period ) for field, period in periods[STATE_TRACKING] )
+		self.periods = { state : self._fit( fieldPeriods ) for state, fieldPeriods in periods.items() }
+
+		self.lastRead = dict.fromkeys( FIELD_BYTES, -float("inf") )
+
+		# Precision selection state per position field
+		self.speed = { "azmAlt" : 0., "raDec" : 0. }			# degrees per second, fastest of the pair
+		self.lastValue = { "azmAlt" : None, "raDec" : None }	# ( monotonic, [first, second] )
+		self.lastPrecise = { "azmAlt" : None, "raDec" : None }
+		self.needPrecise = set()
+
+		# Link usage since start
+		self.since = monotonic()
+		self.wireBytes = 0
+		self.delivered = { field : { "precise" : 0, "coarse" : 0 } for field in ( "azmAlt", "raDec" ) }
+
+
+
+	def _fit ( self, fieldPeriods ):
+		# Stretch the periods of the lowest priority fields until the state fits the budget
+		periods = dict( fieldPeriods )
+		excess = sum( FIELD_BYTES[field] / period for field, period in fieldPeriods ) - self.budget
+		for field, period in reversed( fieldPeriods ):
+			if excess <= 0:
+				break
+			rate = FIELD_BYTES[field] / period
+			reduced = max( rate - excess, rate * 0.01 )
+			periods[field] = FIELD_BYTES[field] / reduced
+			excess -= rate - reduced
+
+		return periods
+
+
+
+	def state ( self, snapshot, gotoPending = False ):
+		# A queued or unconfirmed goto counts as slewing so settle is seen as soon as possible
+		if gotoPending or snapshot.isSlewing:
+			return STATE_SLEWING
+		if snapshot.trackingMode == 0:
+			return STATE_STOPPED
+		return STATE_TRACKING
+
+
+
+	def due ( self, state, now ):
+		# Fields that should be read now, and the seconds until the next field is due
+		periods = self.periods[state]
+		lastRead = self.lastRead
+		fields = tuple( field for field in FIELD_BYTES if now - lastRead[field] >= periods[field] )
+		for field in fields:
+			lastRead[field] = now
+
+		return fields, min( lastRead[field] + periods[field] for field in FIELD_BYTES ) - now
+
+
+
+	def precision ( self, state, fields ):
+		# Position fields among fields to read in 24bit this tick. Tracking is always precise. During a slew
+		# fast axes are read coarse and the slow approach to the target precisely. When stopped a coarse
+		# read is enough unless it left the bucket of the last precise value.
+		return tuple( field for field in fields if field != "isSlewing" and (
+							state == STATE_TRACKING
+							or ( state == STATE_SLEWING and self.speed[field] < self.coarseSpeed )
+							or ( state == STATE_STOPPED and ( field in self.needPrecise or self.lastPrecise[field] is None ))
+						))
+
+
+
+	def account ( self, fields, precise ):
+		# Count the bytes of a successful status batch
+		for field in fields:
+			self.wireBytes += FIELD_BYTES[field] if field == "isSlewing" or field in precise else COARSE_BYTES
+
+
+
+	def refine ( self, field, value, precise, now ):
+		# Track the speed of a position field and return the value to publish. A coarse read that agrees
+		# with the last precise value within its own resolution delivers the precise value instead.
+		last = self.lastValue[field]
+		if last is not None and now > last[0]:
+			self.speed[field] = max( abs( _wrap( a - b )) for a, b in zip( value, last[1] )) / ( now - last[0] )
+		self.lastValue[field] = ( now, value )
+
+		if precise:
+			self.lastPrecise[field] = value
+			self.needPrecise.discard( field )
+		else:
+			reference = self.lastPrecise[field]
+			if reference is not None and all( abs( _wrap( a - b )) < COARSE_RESOLUTION for a, b in zip( value, reference )):
+				value, precise = reference, True
+			else:
+				self.needPrecise.add( field )
+
+		self.delivered[field][ "precise" if precise else "coarse" ] += 1
+		return value
+
+
+
+	def usage ( self, now ):
+		# Effective bytes per second on the wire and the precision delivered per position field
+		elapsed = now - self.since
+		delivered = {}
+		for field, counts in self.delivered.items():
+			total = counts["precise"] + counts["coarse"]
+			delivered[field] = dict( counts, preciseFraction = counts["precise"] / total if total else 0. )
+
+		return {
+					"seconds"			: elapsed,
+					"bytes"				: self.wireBytes,
+					"bytesPerSecond"	: self.wireBytes / elapsed if elapsed > 0 else 0.,
+					"delivered"			: delivered,
+				}
+
+
+
+	def invalidate ( self ):
+		# Read everything on the next tick, e.g. after a goto or reconnect
+		for field in self.lastRead:
+			self.lastRead[field] = -float("inf")
+
+
+
+	def reconnected ( self, success ):
+		# Seconds to wait before the next attempt, doubling up to reconnectMax while attempts fail
+		if success:
+			self.reconnectDelay = self.reconnectMin
+			self.invalidate()
+			return 0.
+
+		delay = self.reconnectDelay
+		self.reconnectDelay = min( self.reconnectMax, delay * 2 )
+		return delay
+
+
+class TelemetryPoller ( object ):
+	"""Background thread that owns the SynScanAZ serial port, runs queued jobs and publishes status snapshots."""
+
+	def __init__ ( self, mount, scheduler = None, site = None, history = None ):
+		# With a synscancoords.Site only Azm/Alt is read and RA/Dec is computed locally. Every successful poll
+		# is appended to history, a synscanhistory.TelemetryHistory, when given.
+		self.mount = mount
+		self.scheduler = scheduler or PollScheduler()
+		self.site = site
+		self.history = history
+		self._gotoPending = False	# Poller thread only, like _jogging
+		self._jogging = set()		# Axes slewing on a jog, poller thread only
+		self._jogTracking = 0		# Tracking mode when the jog started, restored once both axes are idle
+
+		# Jobs are ( priority, sequence, function, args ), sequence keeps FIFO order within a priority
+		self.jobs = queue.PriorityQueue()
+		self.snapshots = queue.Queue()
+		self._sequence = itertools.count()
+
+		self.lastSnapshot = MountSnapshot( monotonic(), mount.isConnected, False, mount.trackingMode, mount.stepIsPrecise, 0., 0., 0., 0. )
+		self._polled = self.lastSnapshot
+
+		self._running = False
+		self._thread = threading.Thread( target = self._run, name = "TelemetryPoller", daemon = True )
+
+
+
+	def start ( self ):
+		# Start the poller thread
+		self._running = True
+		self._thread.start()
+
+
+
+	def shutdown ( self ):
+		# Ask the poller thread to finish and wait for it
+		self._running = False
+		self.submit( lambda mount: None, priority = PRIORITY_STOP )
+		self._thread.join()
+
+
+
+	def submit ( self, function, *args, priority = PRIORITY_NORMAL ):
+		# Queue a job to be run on the poller thread. Function receives the mount as first argument.
+		self.jobs.put( ( priority, next(self._sequence), function, args ) )
+
+
+
+	def stop ( self ):
+		# Emergency stop from any thread. Does not wait in the job queue, SynScanAZ.emergencyStop preempts
+		# whatever the poller thread has on the wire. Queued gotos and jogs are dropped, and one the poller
+		# thread already took is refused by the mount as issued before the stop, so nothing restarts.
+		threading.Thread( target = self._emergencyStop, name = "EmergencyStop", daemon = True ).start()
+
+
+
+	def _emergencyStop ( self ):
+		kept = []
+		try:
+			while True:
+				job = self.jobs.get_nowait()
+				if job[0] != PRIORITY_GOTO and job[2] != self._jog:
+					kept.append( job )
+		except queue.Empty:
+			pass
+		for job in kept:
+			self.jobs.put( job )
+
+		try:
+			latency = self.mount.emergencyStop()
+		except Exception as error:
+			print("Emergency stop failed: %s"%error)
+			return
+
+		# The poller thread resets its own motion state, a stop priority job also makes it poll at once
+		self.submit( self._stopped, priority = PRIORITY_STOP )
+		print("Mount stopped in %.1f ms"%( latency * 1000 ))
+
+
+
+	def _stopped ( self, mount ):
+		self._gotoPending = False
+		self._jogging.clear()
+		self._jogTracking = 0
+
+
+
+	def jog ( self, axis, rate ):
+		# Queue a press-and-hold slew of one axis at a signed hand controller rate, 0 stops it. Starts and stops
+		# both run at stop priority so a release overtakes queued gotos and polls but never its own start.
+		self.submit( self._jog, axis, rate, self.mount.stopGeneration, priority = PRIORITY_STOP )
+
+
+
+	def _jog ( self, mount, axis, rate, generation ):
+		# Starting an axis turns tracking off, the release of the last jogging axis turns it back on. Both
+		# count as issued when queued, so neither goes out after an emergency stop.
+		with mount.issuedIn( generation ):
+			if rate:
+				if not self._jogging:
+					self._jogTracking = mount.trackingMode or 0
+				mount.startAxis( axis, rate )
+				self._jogging.add( axis )
+			else:
+				mount.stopAxis( axis )
+				self._jogging.discard( axis )
+				if not self._jogging and self._jogTracking:
+					mount.setTrackingMode( self._jogTracking )
+					self._jogTracking = 0
+
+
+
+	def goto ( self, function, *args ):
+		# Queue a goto style mount method, e.g. poller.goto( SynScanAZ.gotoRaDec, coords ). It counts as issued
+		# now, an emergency stop before it runs cancels it.
+		self.submit( _issuedIn, self.mount.stopGeneration, function, *args, priority = PRIORITY_GOTO )
+
+
+
+	def latest ( self ):
+		# Drain published snapshots and return the newest one. Called from the GUI thread.
+		try:
+			while True:
+				self.lastSnapshot = self.snapshots.get_nowait()
+		except queue.Empty:
+			pass
+
+		return self.lastSnapshot
+
+
+
+	def usage ( self ):
+		# Poll bytes per second and delivered precision, see PollScheduler.usage
+		return self.scheduler.usage( monotonic() )
+
+
+
+	def _run ( self ):
+		nextPoll = monotonic()
+
+		while self._running:
+			# Run every pending job before polling again
+			try:
+				priority, _, function, args = self.jobs.get( timeout = max( 0., nextPoll - monotonic() ) )
+				self._runJob( function, args, priority )
+				continue
+			except queue.Empty:
+				pass
+
+			# Nothing may end the thread, the GUI would freeze on the last snapshot
+			try:
+				if self.mount.isConnected:
+					state = self.scheduler.state( self._polled, self._gotoPending or bool( self._jogging ))
+					fields, wait = self.scheduler.due( state, monotonic() )
+					if self.site is not None:
+						fields = tuple( field for field in fields if field != "raDec" )
+					if fields:
+						self._poll( state, fields )
+					nextPoll = monotonic() + wait
+				else:
+					self.mount.reconnect()
+					self._publish( self._polled._replace( timestamp = monotonic(), isConnected = self.mount.isConnected ) )
+					wait = self.scheduler.reconnected( self.mount.isConnected )
+					if not self.mount.isConnected:
+						print("Trying to reconnect in %ds"%wait)
+					nextPoll = monotonic() + wait
+			except Exception as error:
+				print("Poll failed: %s"%error)
+				nextPoll = monotonic() + self.scheduler.reconnectMin
+
+
+
+	def _runJob ( self, function, args, priority ):
+		if not self.mount.isConnected:
+			print("No device connected")
+			return
+
+		try:
+			function( self.mount, *args )
+		except Exception as error:
+			name = getattr( args[1] if function is _issuedIn else function, "__name__", function )
+			print("Job %s failed: %s"%( name, error ))
+			return
+
+		# Poll fast from the next tick on until the mount reports the goto done, stops are seen at once too
+		if priority <= PRIORITY_GOTO:
+			self._gotoPending = priority == PRIORITY_GOTO
+			self.scheduler.invalidate()
+
+
+
+	def _poll ( self, state, fields ):
+		# Fast path, a garbled or missing reply keeps the last good values until the next tick.
+		# Fields that were not read this tick keep their previous value.
+		scheduler = self.scheduler
+		precise = scheduler.precision( state, fields )
+		status, error = self.mount.tryGetStatus( precise, fields )
+		if error is not None:
+			return
+
+		now = monotonic()
+		scheduler.account( fields, precise )
+
+		last = self._polled
+		isSlewing = last.isSlewing if status.isSlewing is None else status.isSlewing
+		if status.isSlewing is not None and self._gotoPending:
+			# The first slew state read after a goto confirms it started, or that it already finished
+			self._gotoPending = False
+
+		azm, alt = ( last.azm, last.alt ) if status.azm is None else scheduler.refine( "azmAlt", [ status.azm, status.alt ], "azmAlt" in precise, now )
+		if self.site is not None:
+			ra, dec = ( last.ra, last.dec ) if status.azm is None else self.site.toEquatorial( azm, alt )
+		else:
+			ra, dec = ( last.ra, last.dec ) if status.ra is None else scheduler.refine( "raDec", [ status.ra, status.dec ], "raDec" in precise, now )
+
+		snapshot = MountSnapshot(
+									now,
+									self.mount.isConnected,
+									isSlewing,
+									self.mount.trackingMode,
+									self.mount.stepIsPrecise,
+									azm, alt,
+									ra, dec,
+								)
+		self._publish( snapshot )
+
+		if self.history is not None:
+			self.history.appendSnapshot( snapshot )
+
+
+
+	def _publish ( self, snapshot ):
+		# _polled is the poller thread's own copy, lastSnapshot belongs to the GUI thread
+		self._polled = snapshot
+		self.snapshots.put( snapshot )
+
+
+
+def _issuedIn ( mount, generation, function, *args ):
+	# Run a mount method as issued in the given stop generation
+	with mount.issuedIn( generation ):
+		function( mount, *args )
+
+
+
+def _wrap ( degrees ):
+	# Wrap an angle difference into -180..180
+	return ( degrees + 180. ) % 360. - 180.
@@ -0,0 +1,240 @@
+import itertools
+import struct
+import threading
+from time import monotonic, sleep
+
+import serial
+
+
+# File layout: MAGIC, then records of RECORD header + payload. Every port open appends a session that starts with
+# an OPEN record, timestamps are monotonic seconds since that open.
+MAGIC = b'SYNSCANREC1\n'
+RECORD = struct.Struct( ">dcI" )
+
+# Record kinds
+WRITE = b'W'		# Bytes written
+READ = b'R'			# Bytes a read returned, empty for a read that timed out
+FLUSH = b'F'		# reset_input_buffer, whatever was pending is gone
+OPEN = b'O'			# Port opened, starts a session. Payload is the port name.
+
+
+
+class ReplayError ( Exception ):
+	"""The code under replay did something other than what the recording holds."""
+
+
+
+def readRecording ( path, session = None ):
+	# Records of a recording file as a list of ( timestamp, kind, payload ). session picks the records of one
+	# session by index, without its OPEN record, -1 is the last one.
+	if session is not None:
+		sessions = readSessions( path )
+		try:
+			return sessions[session]
+		except IndexError:
+			raise ReplayError( "%s has %d sessions, there is no session %d"%( path, len( sessions ), session ))
+
+	records = []
+	with open( path, "rb" ) as recording:
+		if recording.read( len( MAGIC )) != MAGIC:
+			raise ValueError( "%s is not a SynScan recording"%path )
+
+		while True:
+			header = recording.read( RECORD.size )
+			if len( header ) < RECORD.size:
+				break
+			timestamp, kind, length = RECORD.unpack( header )
+			records.append( ( timestamp, kind, recording.read( length )) )
+
+	return records
+
+
+
+def readSessions ( path ):
+	# Records of a recording file split into sessions, a list of record lists without the OPEN records.
+	# Records ahead of the first OPEN, from files written before sessions were marked, are a session of their own.
+	sessions = []
+	for record in readRecording( path ):
+		if record[1] == OPEN:
+			sessions.append( [] )
+		elif not sessions:
+			sessions.append( [ record ] )
+		else:
+			sessions[-1].append( record )
+	return sessions
+
+
+
+class RecordingSerial ( object ):
+	"""Serial port wrapper that appends every write, read and input flush to a recording file, one session per open."""
+
+	def __init__ ( self, port, path ):
+		self._port = port
+		self._file = open( path, "ab" )
+		if self._file.tell() == 0:
+			self._file.write( MAGIC )
+		self._start = monotonic()
+		self._lock = threading.Lock()
+		self._record( OPEN, str( getattr( port, "port", "" )).encode() )
+		self._file.flush()
+
+
+
+	def _record ( self, kind, payload ):
+		with self._lock:
+			self._file.write( RECORD.pack( monotonic() - self._start, kind, len( payload )) )
+			self._file.write( payload )
+			if kind == WRITE:
+				# Flushed once per command so a crash loses at most the replies to the last one
+				self._file.flush()
+
+
+
+	def write ( self, data ):
+		self._record( WRITE, bytes( data ))
+		return self._port.write( data )
+
+	def read ( self, size = 1 ):
+		data = self._port.read( size )
+		self._record( READ, data )
+		return data
+
+	def read_until ( self, expected = b'\n', size = None ):
+		data = self._port.read_until( expected, size )
+		self._record( READ, data )
+		return data
+
+	def reset_input_buffer ( self ):
+		self._port.reset_input_buffer()
+		self._record( FLUSH, b'' )
+
+	def reset_output_buffer ( self ):
+		self._port.reset_output_buffer()
+
+	def cancel_read ( self ):
+		self._port.cancel_read()
+
+	@property
+	def in_waiting ( self ):
+		return self._port.in_waiting
+
+	@property
+	def timeout ( self ):
+		return self._port.timeout
+
+	@timeout.setter
+	def timeout ( self, value ):
+		self._port.timeout = value
+
+	def close ( self ):
+		self._port.close()
+		with self._lock:
+			self._file.close()
+
+
+
+class ReplaySerial ( object ):
+	"""Serial port stand-in that answers from a recording. Writes must match the recorded ones in order.
+
+	speed 1 keeps the recorded timing, 10 plays ten times faster and None as fast as the code asks.
+	session is the index of the recorded port open to play, see readSessions.
+	Use cacheTtl = 0 on both sides, cache hits depend on timing and would change what goes on the wire.
+	"""
+
+	def __init__ ( self, path, speed = 1., session = 0 ):
+		self.records = readRecording( path, session )
+		self.speed = speed
+		self.position = 0
+		self.timeout = None
+		self._start = monotonic()
+
+
+
+	def _next ( self, kind ):
+		if self.position >= len( self.records ):
+			raise ReplayError( "Recording ended, expected %r"%kind )
+
+		timestamp, recordedKind, payload = self.records[ self.position ]
+		if recordedKind != kind:
+			raise ReplayError( "Record %d is %r, replay asked for %r"%( self.position, recordedKind, kind ))
+		self.position += 1
+
+		# Hold the reply back until its recorded time, scaled by speed
+		if self.speed:
+			delay = timestamp / self.speed - ( monotonic() - self._start )
+			if delay > 0:
+				sleep( delay )
+
+		return payload
+
+
+
+	def write ( self, data ):
+		recorded = self._next( WRITE )
+		if recorded != bytes( data ):
+			raise ReplayError( "Record %d wrote %r, replay wrote %r"%( self.position - 1, recorded, bytes( data )) )
+		return len( data )
+
+	def read ( self, size = 1 ):
+		return self._next( READ )
+
+	def read_until ( self, expected = b'\n', size = None ):
+		return self._next( READ )
+
+	def reset_input_buffer ( self ):
+		self._next( FLUSH )
+
+	def reset_output_buffer ( self ):
+		pass
+
+	def cancel_read ( self ):
+		pass
+
+	@property
+	def in_waiting ( self ):
+		# Size of the next recorded read, so callers that ask before reading get the same chunks
+		if self.position < len( self.records ) and self.records[ self.position ][1] == READ:
+			return len( self.records[ self.position ][2] )
+		return 0
+
+	def close ( self ):
+		pass
+
+	@property
+	def finished ( self ):
+		return self.position >= len( self.records )
+
+
+
+def recorder ( path, transport = serial.Serial ):
+	# SynScanAZ transport that opens the port with transport and records the session to path:
+	#	mount = SynScanAZ( '/dev/ttyUSB0', transport = recorder( 'session.rec' ))
+	def openPort ( **settings ):
+		return RecordingSerial( transport( **settings ), path )
+	return openPort
+
+
+
+def replayer ( path, speed = 1., session = 0 ):
+	# SynScanAZ transport that plays path back, the port name and settings are ignored:
+	#	mount = SynScanAZ( 'replay', transport = replayer( 'session.rec', speed = 10 ))
+	# Each open plays the next session from session on, so a reconnect replays the way it was recorded.
+	opens = itertools.count( session )
+	def openPort ( **settings ):
+		return ReplaySerial( path, speed, next( opens ))
+	return openPort
+
+
+
+if __name__ == "__main__":
+	import argparse
+
+	parser = argparse.ArgumentParser( description = "Print a SynScan serial recording" )
+	parser.add_argument( "path" )
+	args = parser.parse_args()
+
+	for timestamp, kind, payload in readRecording( args.path ):
+		if kind == OPEN:
+			print( "--- session on %s"%payload.decode() )
+		else:
+			print( "%10.4f %s %r"%( timestamp, kind.decode(), payload ))
@@ -1,29 +1,216 @@
 import serial
-import inspect
-from time import sleep
+import threading
+from collections import namedtuple, deque
+from contextlib import contextmanager
+from time import sleep, perf_counter, localtime
+
+import synscancodec
+from synscanstats import MountStats
+from synscancodec import TERMINATOR, REPLY_ACK, REPLY_BOOL, REPLY_BYTE, REPLY_8BYTES, REPLY_VERSION
+
+
+# Result of a batched status query, positions in degrees
+MountStatus = namedtuple( "MountStatus", [ "isSlewing", "azm", "alt", "ra", "dec" ] )
+
+# Fields a status batch can be limited to, in the order they are sent
+STATUS_FIELDS = ( "isSlewing", "azmAlt", "raDec" )
+
+# Result of the non-raising fast path. error is None on success, otherwise one of the error codes below.
+Result = namedtuple( "Result", [ "value", "error" ] )
+
+# Error codes, shared by the fast path and the exception classes
+NOT_CONNECTED	= 1
+TIMEOUT			= 2
+PROTOCOL_ERROR	= 3
+STOPPED			= 4
+
+
+
+class MountError ( Exception ):
+	"""Base class for mount errors. Carries the failing command character and the raw reply, the message is only built when printed."""
+
+	code = None
+
+	def __init__ ( self, command, reply = b'' ):
+		Exception.__init__( self, command, reply )
+		self.command = command
+		self.reply = reply
+
+	def __str__ ( self ):
+		return "%s: command %r, reply %r"%( self.__class__.__name__, self.command, self.reply )
+
+
+
+class MountNotConnected ( MountError ):
+	"""The serial port is not open."""
+	code = NOT_CONNECTED
+
+
+
+class MountTimeout ( MountError ):
+	"""The reply did not arrive within the command's time budget, or the command could not be written."""
+	code = TIMEOUT
+
+
+
+class MountProtocolError ( MountError ):
+	"""The reply arrived but did not match the expected format."""
+	code = PROTOCOL_ERROR
+
+
+
+class MountStopped ( MountError ):
+	"""A motion command issued before the latest emergency stop reached the port after it and was not sent."""
+	code = STOPPED
+
+
+
+ERRORS = { NOT_CONNECTED : MountNotConnected, TIMEOUT : MountTimeout, PROTOCOL_ERROR : MountProtocolError, STOPPED : MountStopped }
+
+# Raised by pyserial when the port goes away mid-session, e.g. a USB adapter unplugged
+_SERIAL_ERRORS = ( serial.SerialException, OSError )
+
+# Preallocated failure results so the fast path does not allocate on errors either
+_FAILED = { code : Result( None, code ) for code in ERRORS }
+
+
+
+class FairLock ( object ):
+	"""Reentrant lock handed over in arrival order, so a busy poller cannot starve other consumers of the mount."""
+
+	def __init__ ( self ):
+		self._lock = threading.Lock()
+		self._waiters = deque()
+		self._owner = None
+		self._depth = 0
+
+	def acquire ( self ):
+		me = threading.get_ident()
+		with self._lock:
+			if self._owner == me:
+				self._depth += 1
+				return
+			if self._owner is None and not self._waiters:
+				self._owner = me
+				self._depth = 1
+				return
+			# Contended, queue up and wait for the owner to hand the lock over
+			turn = threading.Event()
+			self._waiters.append( ( me, turn ) )
+		turn.wait()
+
+	def acquireUrgent ( self ):
+		# Acquire ahead of every queued waiter, for the emergency stop
+		me = threading.get_ident()
+		with self._lock:
+			if self._owner == me:
+				self._depth += 1
+				return
+			if self._owner is None:
+				self._owner = me
+				self._depth = 1
+				return
+			turn = threading.Event()
+			self._waiters.appendleft( ( me, turn ) )
+		turn.wait()
+
+	def release ( self ):
+		with self._lock:
+			self._depth -= 1
+			if self._depth:
+				return
+			if self._waiters:
+				self._owner, turn = self._waiters.popleft()
+				self._depth = 1
+				turn.set()
+			else:
+				self._owner = None
+
+	def isOwned ( self ):
+		# True when the calling thread holds the lock
+		return self._owner == threading.get_ident()
+
+	__enter__ = acquire
+
+	def __exit__ ( self, *exc ):
+		self.release()
+
+
+# Cancel goto, tracking off, stop both axes
+_STOP_SEQUENCE = b'MT\x00' + synscancodec.encodeFixedRate( synscancodec.AXIS_AZM, True, 0 ) + synscancodec.encodeFixedRate( synscancodec.AXIS_ALT, True, 0 )
+
+
+
+class _Flight ( object ):
+	"""One cached read in progress. Followers wait on done and take value, or failure when value is None."""
+
+	__slots__ = ( "done", "value", "failure" )
+
+	def __init__ ( self ):
+		self.done = threading.Event()
+		self.value = None
+		self.failure = None
+
 
 
 class SynScanAZ ( object ):
 	"""Class to control Synscan AZ Goto mount over serial port."""
-	
-	def __init__ ( self ):
-		# Open serial port according to the mount specs
-		try:
-			self.ser = serial.Serial(	
-									port 		= '/dev/ttyUSB0',
-									baudrate 	= 9600			,
-									parity		= 'N'			,
-									stopbits	= 1				,
-									timeout		= 5				,
-								)
-			self.isConnected = True
-		except:
-			self.ser = 0
-			self.isConnected = False
+
+	# Reply timeout budgets in seconds for each command class. A 18 byte reply takes ~19 ms on the wire at 9600 baud.
+	TIMEOUT_POSITION	= 0.1	# E, e, Z, z
+	TIMEOUT_STATUS		= 0.1	# L, J, t, p, m
+	TIMEOUT_GOTO		= 0.5	# R, r, B, b, S, s, M, T acks
+	TIMEOUT_DEFAULT		= 1.	# Everything else, also the port-wide timeout
+	RESYNC_QUIET		= 0.05	# Line must stay silent this long before a failed exchange is considered flushed
+
+	def __init__ ( self, port = '/dev/ttyUSB0', cacheTtl = 0.1, direct = False, transport = serial.Serial ):
+		# Open serial port according to the mount specs. Position and slew state reads younger than
+		# cacheTtl seconds are answered from cache, 0 disables the cache. With direct, readAxes() talks to
+		# the motor controllers through passthrough instead of asking the hand controller. transport opens
+		# the port with serial.Serial arguments, see synscanrecord for recording and replaying sessions.
+		self.port = port
+		self.transport = transport
+		self.cacheTtl = cacheTtl
+		self.direct = direct
+		self.ser = 0
+		self.statistics = MountStats()
+		self.isConnected = False
+
+		# Every write, framed read and decode runs under this lock so replies cannot be attributed to another thread's command
+		self.lock = FairLock()
+
+		# Context of the last failed exchange per thread: code, command, reply. Turned into an exception only by the raising API.
+		self.lastFailure = threading.local()
+
+		# Set by emergencyStop while it takes over the port, exchanges in flight give up without resyncing
+		self._aborting = False
+		self.lastStopLatency = None
+
+		# Counts emergency stops. A motion command carries the generation it was issued in and is refused if a
+		# stop came in between, so a goto or jog already queued on the lock cannot restart the mount. Threads
+		# that issue on behalf of others, like the poller, set the generation with issuedIn().
+		self.stopGeneration = 0
+		self._issued = threading.local()
+
+		# Status batches by ( precise, fields ), built on first use
+		self._statusPlans = {}
+
+		# Read-through cache: key -> ( perf_counter at request, value ), and the reads in flight per key.
+		# The generation changes on every command that moves the mount, stale reads in flight are not stored.
+		self._cache = {}
+		self._inflight = {}
+		self._cacheLock = threading.Lock()
+		self._cacheGeneration = 0
+		self.reconnect()
 
 		self.stepIsPrecise = False
 		self.trackingMode = None
 		self.isTelescope = True
+
+		# Mirror mode: direction the mirror sends light to as [azm, alt], straight up by default, and the
+		# synscancoords.Site used to find the target, built from the mount location on first use
+		self.feed = [ 0., 90. ]
+		self.site = None
 		#self.alignmentCompleted = False
 
 
@@ -37,308 +224,590 @@ class SynScanAZ ( object ):
 
 	def reconnect( self ):
 		# Try to connect if not connected at init
+		self.invalidate()
+		with self.lock:
+			try:
+				self.ser = self.transport(	
+										port 		= self.port		,
+										baudrate 	= 9600			,
+										parity		= 'N'			,
+										stopbits	= 1				,
+										timeout		= self.TIMEOUT_DEFAULT,
+									)
+				self.isConnected = True
+			except:
+				self.isConnected = False
+
+
+
+	def emergencyStop ( self ):
+		# Stop everything now. Aborts the read in flight, takes the port ahead of every queued caller, flushes
+		# both buffers and sends 'M', 'T\x00' and a stop for each axis in one write. Returns the stop latency
+		# in seconds, from the call to the last ack, and records it as 'stop' in the statistics.
+		start = perf_counter()
+		if not self.isConnected:
+			self._fail( NOT_CONNECTED, b'M', b'' )
+			self._raise()
+
+		self.stopGeneration += 1
+		self._aborting = True
 		try:
-			self.ser = serial.Serial(	
-									port 		= '/dev/ttyUSB0',
-									baudrate 	= 9600			,
-									parity		= 'N'			,
-									stopbits	= 1				,
-									timeout		= 5				,
-								)
-			self.isConnected = True
-		except:
-			self.isConnected = False
+			self.ser.cancel_read()
+		except Exception:
+			pass
 
+		self.lock.acquireUrgent()
+		try:
+			self._aborting = False
+			self.invalidate()
+
+			# A zero timeout read clears a cancel that arrived after the read it was meant for
+			self.ser.timeout = 0
+			self.ser.read( 1 )
+			self.ser.reset_input_buffer()
+			self.ser.reset_output_buffer()
+
+			if not self.ser.write( _STOP_SEQUENCE ):
+				self.statistics.recordWriteFailure( "stop" )
+				self._fail( TIMEOUT, b'M', b'' )
+				self._raise()
+
+			# Replies to aborted commands may still arrive ahead of the four acks. The stop counts as done when
+			# the line ends in '####', reading goes on until it is quiet so the next command starts clean.
+			received = bytearray()
+			acked = None
+			deadline = start + self.TIMEOUT_GOTO
+			while True:
+				self.ser.timeout = self.RESYNC_QUIET if acked else max( 0., deadline - perf_counter() )
+				chunk = self.ser.read( max( 1, self.ser.in_waiting ))
+				if not chunk:
+					break
+				received += chunk
+				acked = perf_counter() if received.endswith( b'####' ) else None
+
+			if acked is None:
+				self.statistics.recordTimeout( "stop" )
+				self._fail( TIMEOUT if not received.endswith( TERMINATOR ) else PROTOCOL_ERROR, b'M', bytes( received[-16:] ))
+				self._raise()
+
+			self.trackingMode = 0
+			self.lastStopLatency = latency = acked - start
+			self.statistics.record( "stop", latency )
+			return latency
+		except _SERIAL_ERRORS:
+			self._lost( b'M' )
+			self._raise()
+		finally:
+			self.lock.release()
+
+
+
+	def transaction ( self ):
+		# Exclusive use of the mount for a sequence of commands: with mount.transaction(): ...
+		return self.lock
+
+
+
+	@contextmanager
+	def issuedIn ( self, generation ):
+		# Motion commands of this thread inside the block count as issued in the given stop generation:
+		#	generation = mount.stopGeneration	# when the goto is queued
+		#	with mount.issuedIn( generation ): mount.gotoAzmAlt( coords )
+		previous = getattr( self._issued, "generation", None )
+		self._issued.generation = generation
+		try:
+			yield
+		finally:
+			self._issued.generation = previous
 
 
-	def togglePrecision ( self ):
-		# Sets the step size to precise
-		if self.isConnected:
-			self.stepIsPrecise = ( not self.stepIsPrecise )
 
+	def _motionGeneration ( self ):
+		# Stop generation a motion command of this thread counts as issued in
+		generation = getattr( self._issued, "generation", None )
+		return self.stopGeneration if generation is None else generation
 
 
 
-	def getRaDec ( self ):
-		# Get current pointing in 16bit, J2000. Returns [ra, dec]
-		ra = 0
-		dec = 0
+	def _exchange ( self, cmd, replyFormat, replyLength, timeout, binary = False, generation = None ):
+		# Write a command and read its reply up to the '#' terminator within the given time budget.
+		# Binary replies may contain '#' as data and are read by length instead. Motion commands pass the
+		# stop generation they were issued in and are refused once an emergency stop has come after it.
+		# Returns the reply including the terminator, or None with the error recorded in lastFailure.
+		if not self.isConnected:
+			return self._fail( NOT_CONNECTED, cmd, b'' )
 
-		if self.isConnected:
-			response = 0
-			success = self.ser.write(str.encode('E'))
+		with self.lock:
+			if self._aborting:
+				return self._fail( TIMEOUT, cmd, b'' )
 
-			if success:
-				response = self.ser.read(10)[:-1]
-			else:
-				print("Communication failure in:", inspect.stack()[0][3])
+			if generation is not None and generation != self.stopGeneration:
+				return self._fail( STOPPED, cmd, b'' )
 
-			coord = response.split(str.encode(','))
-			ra  = int( coord[0], 16 ) / 65536. * 360
-			dec = int( coord[1], 16 ) / 65536. * 360
+			start = perf_counter()
 
-		return [ra, dec]
+			if self.ser.timeout != timeout:
+				self.ser.timeout = timeout
 
+			try:
+				if not self.ser.write( cmd ):
+					self.statistics.recordWriteFailure( chr( cmd[0] ))
+					return self._fail( TIMEOUT, cmd, b'' )
 
+				reply = self._readReply( cmd, replyFormat, replyLength, binary )
+			except _SERIAL_ERRORS:
+				return self._lost( cmd )
 
-	def getRaDecPrecise ( self ):
-		# Get current pointing in 24bit, J2000. Returns [ra, dec]
-		ra = 0
-		dec = 0
+			if reply is not None:
+				self.statistics.record( chr( cmd[0] ), perf_counter() - start )
 
-		if self.isConnected:
-			response = 0
-			success = self.ser.write(str.encode('e'))
+			return reply
 
-			if success:
-				response = self.ser.read(18)[:-1]
-			else:
-				print("Communication failure in:", inspect.stack()[0][3])
 
-			coord = response.split(str.encode(','))
-			ra  = int( coord[0][:-2], 16 ) / 16777216. * 360 # Last two digits discarded
-			dec = int( coord[1][:-2], 16 ) / 16777216. * 360 # Last two digits discarded
 
-		return [ra, dec]
+	def _readReply ( self, cmd, replyFormat, replyLength, binary = False ):
+		# Read and validate one framed reply to cmd. Returns the reply or None after resynchronising.
+		if binary:
+			reply = self.ser.read( replyLength )
+		else:
+			reply = self.ser.read_until( TERMINATOR, replyLength )
 
+		if len(reply) != replyLength or replyFormat.fullmatch( reply ) is None:
+			if self._aborting:
+				# Read cancelled by emergencyStop, which flushes the port itself
+				return self._fail( TIMEOUT, cmd, reply )
 
+			# Timed out or garbled, drop whatever is left so the next command starts clean
+			self._resync()
 
-	def getAzmAltCoarse ( self ):
-		# Get current pointing in azimuth and altitude, 16bit. Returns [azm, alt]
-		azm = 0
-		alt = 0
+			if len(reply) < replyLength and reply[-1:] != TERMINATOR:
+				self.statistics.recordTimeout( chr( cmd[0] ))
+				return self._fail( TIMEOUT, cmd, reply )
 
-		if self.isConnected:
-			response = 0
-			success = self.ser.write(str.encode('Z'))
+			self.statistics.recordGarbled( chr( cmd[0] ))
+			return self._fail( PROTOCOL_ERROR, cmd, reply )
 
-			if success:
-				response = self.ser.read(10)[:-1]
-			else:
-				print("Communication failure in:", inspect.stack()[0][3])
+		return reply
 
-			coord = response.split(str.encode(','))
-			azm = int( coord[0], 16 ) / 65536. * 360
-			alt = int( coord[1], 16 ) / 65536. * 360
 
-		return [azm, alt]
 
+	def _resync ( self ):
+		# Flush the input buffer and drain late replies still on the wire until the line goes quiet
+		self.ser.reset_input_buffer()
+		self.ser.timeout = self.RESYNC_QUIET
+		while self.ser.read( 256 ):
+			pass
 
 
-	def getAzmAltPrecise ( self ):
-		# Get current pointing in azimuth and altitude, 24bit. Returns [azm, alt]
-		azm = 0
-		alt = 0
 
-		if self.isConnected:
-			response = 0
-			success = self.ser.write( str.encode('z'))
+	def _lost ( self, cmd ):
+		# The port failed under an exchange. Close it and report not connected, the poller reconnects from there.
+		self.isConnected = False
+		self.invalidate()
+		try:
+			self.ser.close()
+		except Exception:
+			pass
+		return self._fail( NOT_CONNECTED, cmd, b'' )
+
 
-			if success:
-				response = self.ser.read(18)[:-1]
+
+	def _fail ( self, code, cmd, reply ):
+		# Remember why the last exchange of this thread failed, cheap enough for the hot path
+		failure = self.lastFailure
+		failure.code = code
+		failure.command = cmd[:1]
+		failure.reply = reply
+		return None
+
+
+
+	def _raise ( self ):
+		# Raise the exception matching the last failed exchange
+		failure = self.lastFailure
+		raise ERRORS[ failure.code ]( failure.command, failure.reply )
+
+
+
+	def _checkConnected ( self, command ):
+		if not self.isConnected:
+			raise MountNotConnected( command )
+
+
+
+	def _cached ( self, key, fetch, *args ):
+		# Return a value younger than cacheTtl, or share a single fetch( *args ) with every concurrent caller of the same key.
+		# Returns None on failure with lastFailure set for this thread as well.
+		if self.cacheTtl <= 0:
+			return fetch( *args )
+
+		with self._cacheLock:
+			entry = self._cache.get( key )
+			if entry is not None and perf_counter() - entry[0] < self.cacheTtl:
+				return entry[1]
+
+			# A lock holder never waits on a flight, the leader's fetch may be queued behind it on the same lock
+			flight = self._inflight.get( key )
+			if self.lock.isOwned():
+				leader = None
+			elif flight is None:
+				flight = self._inflight[key] = _Flight()
+				generation = self._cacheGeneration
+				leader = True
 			else:
-				print("Communication failure in ", inspect.stack()[0][3])
+				leader = False
 
-			coord = response.split(str.encode(','))
-			azm = int( coord[0][:-2], 16 ) / 16777216. * 360 # Last two digits discarded
-			alt = int( coord[1][:-2], 16 ) / 16777216. * 360 # Last two digits discarded
+		if leader is None:
+			return fetch( *args )
 
-		return [azm, alt]
+		if not leader:
+			flight.done.wait()
+			if flight.value is None:
+				return self._fail( *flight.failure )
+			return flight.value
 
+		start = perf_counter()
+		try:
+			flight.value = value = fetch( *args )
+			if value is None:
+				failure = self.lastFailure
+				flight.failure = ( failure.code, failure.command, failure.reply )
+		except BaseException:
+			flight.failure = ( NOT_CONNECTED, b'', b'' )
+			raise
+		finally:
+			with self._cacheLock:
+				del self._inflight[key]
+				if flight.value is not None and generation == self._cacheGeneration:
+					self._cache[key] = ( start, flight.value )
+			flight.done.set()
 
+		return value
 
-	def gotoRaDec ( self, coords ):
-		# Slew to the given coordinates
-		if self.stepIsPrecise:
-			self.gotoRaDecPrecise( coords )
-		else:
-			self.gotoRaDecCoarse( coords )
-		
-		#If pointing with mirror, calculate new altitude based on half of zenith angle
-		if not self.isTelescope:
-			azmAlt = self.getAzmAltPrecise()
-			azm = azmAlt[0]
-			alt = azmAlt[1]
 
-			newAlt = 90 - (90-alt)/2.
-			self.gotoAzmAlt( [azm,newAlt] ) 
 
+	def invalidate ( self ):
+		# Drop cached reads, called by every command that moves the mount or changes what it reports
+		with self._cacheLock:
+			self._cache.clear()
+			self._cacheGeneration += 1
 
 
 
-	def gotoRaDecCoarse ( self, coords ):
-		# Goto given coordinate, input values will be converted to 16bit hex. Units, degrees.
+	def _queryPosition ( self, name ):
+		# Position query by command table name, through the cache. Returns [first, second] in degrees or None.
+		position = self._cached( name, self._readPosition, name )
+		return None if position is None else list( position )
 
-		if self.isConnected:
-			ra = coords[0]
-			dec = coords[1]
 
-			hexRa = hex( int( round( float( ra )) / 360. * 65536 ))
-			hexDec = hex( int( round( float( dec )) / 360. * 65536 ))
 
-			response = 0
-			cmd = 'R' + (str(hexRa)[2:].zfill(4)+ ',' + str(hexDec)[2:].zfill(4)).upper()
+	def _readPosition ( self, name ):
+		# Send a position query from the command table and decode the reply. Returns ( first, second ) in degrees or None.
+		command = synscancodec.COMMANDS[name]
 
-			success = self.ser.write( str.encode( cmd ))
+		with self.lock:
+			response = self._exchange( command.query, command.format.replyFormat, command.format.replyLength, self.TIMEOUT_POSITION )
 
-			if success:
-				self.ser.read(1)
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-				return 1
+			if response is None:
+				return None
 
-		print("No device connected")
-		return 1
+			return tuple( command.format.decode( response ))
 
 
 
-	def gotoRaDecPrecise ( self, coords ):
-		# Goto given coordinate, input values will be converted to 24bit hex. Units, degrees.
+	def _readSlewing ( self ):
+		response = self._exchange( b'L', REPLY_BOOL, 2, self.TIMEOUT_STATUS )
+		return None if response is None else response[0] == 0x31
 
-		if self.isConnected:
-			ra = coords[0]
-			dec = coords[1]
 
-			hexRa  = hex( int( round( float( ra ))  / 360. * 16777216 ) )
-			hexDec = hex( int( round( float( dec )) / 360. * 16777216 ) )
 
-			cmd = 'r' + ((str(hexRa)[2:]+'00').zfill(8) + ',' + (str(hexDec)[2:]+'00').zfill(8)).upper() 
+	def _sendPosition ( self, name, coords ):
+		# Send a goto or sync from the command table and wait for the ack. Units, degrees. Returns True or None.
+		generation = self._motionGeneration() if name.startswith( "goto" ) else None
+		self.invalidate()
 
-			success = self.ser.write( str.encode( cmd ))
+		# The codec buffer belongs to this thread, only the exchange needs the lock
+		cmd = synscancodec.encodePosition( name, coords )
 
-			if success:
-				self.ser.read(1)
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-				return 1
+		if self._exchange( cmd, REPLY_ACK, 1, self.TIMEOUT_GOTO, generation = generation ) is None:
+			return None
 
-		print("No device connected")
-		return 1
+		return True
 
 
 
-	def gotoAzmAlt ( self, coords ):
-		if self.stepIsPrecise:
-			self.gotoAzmAltPrecise( coords )
-		else:
-			self.gotoAzmAltCoarse( coords )
+	def _status ( self, precise, fields = None ):
+		# Batched status query behind getStatus and tryGetStatus. Returns MountStatus or None.
+		if not self.isConnected:
+			return self._fail( NOT_CONNECTED, b'L', b'' )
 
+		plan = self._statusPlans.get( ( precise, fields ) )
+		if plan is None:
+			plan = self._statusPlans[ ( precise, fields ) ] = self._statusPlan( precise, fields )
+		query, commands = plan
+		generation = self._cacheGeneration
 
+		with self.lock:
+			try:
+				start = perf_counter()
 
-	def gotoAzmAltCoarse ( self, coords ):
-		# Goto given coordinate, input values will be converted to 16bit hex. Units, degrees.
+				if self.ser.timeout != self.TIMEOUT_POSITION:
+					self.ser.timeout = self.TIMEOUT_POSITION
 
-		if self.isConnected:
-			azm = coords[0]
-			alt = coords[1]
+				if not self.ser.write( query ):
+					self.statistics.recordWriteFailure( "status" )
+					return self._fail( TIMEOUT, query[0:1], b'' )
+
+				# Each read only waits for its own reply, a bad one flushes the rest of the batch
+				values = [ None ] * 5
+				fresh = []
+				for field, command, key in commands:
+					if command is None:
+						reply = self._readReply( b'L', REPLY_BOOL, 2 )
+						if reply is None:
+							return None
+						values[0] = reply[0] == 0x31
+						fresh.append( ( key, values[0] ))
+					else:
+						reply = self._readReply( command.query, command.format.replyFormat, command.format.replyLength )
+						if reply is None:
+							return None
+						offset = 1 if field == "azmAlt" else 3
+						values[ offset : offset + 2 ] = position = command.format.decode( reply )
+						fresh.append( ( key, tuple( position )))
+
+				self.statistics.record( "status", perf_counter() - start )
+			except _SERIAL_ERRORS:
+				return self._lost( b'L' )
 
-			hexAzm = hex( int( round( float( azm )) / 360. * 65536 ))
-			hexAlt = hex( int( round( float( alt )) / 360. * 65536 ))
+		# The batch answers the single queries too
+		if self.cacheTtl > 0:
+			with self._cacheLock:
+				for key, value in fresh if generation == self._cacheGeneration else ():
+					self._cache[key] = ( start, value )
 
-			response = 0
-			cmd = 'B' + (str(hexAzm)[2:].zfill(4)+ ',' + str(hexAlt)[2:].zfill(4)).upper()
+		return MountStatus( *values )
 
-			success = self.ser.write( str.encode( cmd ))
 
-			if success:
-				self.ser.read(1)
-				return 0
+
+	def _statusPlan ( self, precise, fields ):
+		# Query bytes and reply order for a status batch, None command is the slew state.
+		# precise is a bool for the whole batch or the collection of position fields to read in 24bit.
+		table = synscancodec.COMMANDS
+		if precise is True or precise is False:
+			precise = STATUS_FIELDS if precise else ()
+		positions = {
+						"azmAlt"	: 'getAzmAltPrecise' if "azmAlt" in precise else 'getAzmAltCoarse',
+						"raDec"		: 'getRaDecPrecise' if "raDec" in precise else 'getRaDec',
+					}
+
+		# ( field, command, cache key )
+		commands = []
+		for field in STATUS_FIELDS:
+			if fields is not None and field not in fields:
+				continue
+			if field == "isSlewing":
+				commands.append( ( field, None, "isSlewing" ))
 			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-				return 1
+				commands.append( ( field, table[ positions[field] ], positions[field] ))
 
-		print("No device connected")
-		return 1
+		if not commands:
+			raise ValueError( "No status fields in %r"%( fields, ))
 
+		return b''.join( b'L' if command is None else command.query for field, command, key in commands ), commands
 
-	def gotoAzmAltPrecise ( self, coords ):
-		# Goto given coordinate, input values will be converted to 24bit hex. Units, degrees.
 
+
+	# Non-raising fast path for tight loops. Every method returns a Result( value, error ).
+
+	def tryGetStatus ( self, precise = True, fields = None ):
+		status = self._status( precise, fields )
+		return _FAILED[ self.lastFailure.code ] if status is None else Result( status, None )
+
+
+
+	def tryQueryPosition ( self, name ):
+		# Position query by command table name, e.g. 'getAzmAltPrecise'
+		position = self._queryPosition( name )
+		return _FAILED[ self.lastFailure.code ] if position is None else Result( position, None )
+
+
+
+	def trySendPosition ( self, name, coords ):
+		# Goto or sync by command table name, e.g. 'gotoAzmAltPrecise'
+		return _FAILED[ self.lastFailure.code ] if self._sendPosition( name, coords ) is None else Result( True, None )
+
+
+
+	def tryIsSlewing ( self ):
+		slewing = self._cached( "isSlewing", self._readSlewing )
+		return _FAILED[ self.lastFailure.code ] if slewing is None else Result( slewing, None )
+
+
+
+	def getStatus ( self, precise = True, fields = None ):
+		# Query slew state, Azm/Alt and RA/Dec in a single round trip. The three commands are written
+		# back to back and the concatenated replies are demultiplexed in order. Returns MountStatus.
+		# fields limits the batch to a subset of STATUS_FIELDS, the others are None in the result. precise is
+		# a bool or a tuple of the position fields to read in 24bit, fields and precise must be hashable.
+		status = self._status( precise, fields )
+		if status is None:
+			self._raise()
+
+		return status
+
+
+
+	def stats ( self ):
+		# Per-command counters, timeout and garble counts and latency histograms as a dict
+		return self.statistics.asDict()
+
+
+
+	def togglePrecision ( self ):
+		# Sets the step size to precise
 		if self.isConnected:
-			azm = coords[0]
-			alt = coords[1]
+			self.stepIsPrecise = ( not self.stepIsPrecise )
 
-			hexAzm = hex( int( round( float( azm )) / 360. * 16777216. ) )
-			hexAlt = hex( int( round( float( alt )) / 360. * 16777216. ))
 
-			response = 0
-			cmd = 'b' + ((str(hexAzm)[2:]+'00').zfill(8) + ',' + (str(hexAlt)[2:]+'00').zfill(8)).upper()
 
-			success = self.ser.write( str.encode( cmd ))
 
-			if success:
-				self.ser.read(1)
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-				return 1
+	def getRaDec ( self ):
+		# Get current pointing in 16bit, J2000. Returns [ra, dec]
+		position = self._queryPosition( 'getRaDec' )
+		if position is None:
+			self._raise()
 
-		print("No device connected")
-		return 1
+		return position
 
 
 
-	def syncRaDec ( self, coords ):
+	def getRaDecPrecise ( self ):
+		# Get current pointing in 24bit, J2000. Returns [ra, dec]
+		position = self._queryPosition( 'getRaDecPrecise' )
+		if position is None:
+			self._raise()
+
+		return position
+
+
+
+	def getAzmAltCoarse ( self ):
+		# Get current pointing in azimuth and altitude, 16bit. Returns [azm, alt]
+		position = self._queryPosition( 'getAzmAltCoarse' )
+		if position is None:
+			self._raise()
+
+		return position
+
+
+
+	def getAzmAltPrecise ( self ):
+		# Get current pointing in azimuth and altitude, 24bit. Returns [azm, alt]
+		position = self._queryPosition( 'getAzmAltPrecise' )
+		if position is None:
+			self._raise()
+
+		return position
+
+
+
+	def gotoRaDec ( self, coords ):
+		# Slew to the given coordinates
+		#If pointing with mirror, slew once straight to the mirror normal between target and feed
+		if not self.isTelescope:
+			self.gotoAzmAlt( self.mirrorPointing( coords ) )
+			return
+
 		if self.stepIsPrecise:
-			self.syncRaDecPrecise( coords )
+			self.gotoRaDecPrecise( coords )
 		else:
-			self.syncRaDecCoarse( coords )
+			self.gotoRaDecCoarse( coords )
 
 
 
+	def mirrorPointing ( self, coords ):
+		# Mirror [azm, alt] that sends light from the RA/Dec target along self.feed. The target is placed on the
+		# sky locally from the site location and this computer's clock, without the hand controller alignment.
+		from synscancoords import Site		# numpy is only needed in mirror mode
 
-	def syncRaDecCoarse ( self, coords ):
-		# Sync current pointing to the given coordinates, 16bit. Units, degrees.
+		if self.site is None:
+			self.site = Site.fromMount( self )
 
-		if self.isConnected:
-			ra = coords[0]
-			dec = coords[1]
+		return self.site.mirrorPointing( coords[0], coords[1], self.feed )
 
-			hexRa = hex( int( round( float( ra )) / 360. * 65536 ))
-			hexDec = hex( int( round( float( dec )) / 360. * 65536 ))
 
-			response = 0
-			cmd = 'S' + (str(hexRa)[2:].zfill(4)+ ',' + str(hexDec)[2:].zfill(4)).upper()
 
-			success = self.ser.write( str.encode ( cmd ))
-			self.ser.read(1)
 
-			if success:
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-				return 1
+	def gotoRaDecCoarse ( self, coords ):
+		# Goto given coordinate, input values will be converted to 16bit hex. Units, degrees.
+		if self._sendPosition( 'gotoRaDecCoarse', coords ) is None:
+			self._raise()
 
-		print("No device connected")
-		return 1
 
+	def gotoRaDecPrecise ( self, coords ):
+		# Goto given coordinate, input values will be converted to 24bit hex. Units, degrees.
+		if self._sendPosition( 'gotoRaDecPrecise', coords ) is None:
+			self._raise()
 
 
-	def syncRaDecPrecise ( self, coords ):
-		# Sync current pointing to the given coordinates, 24bit. Units, degrees.
+	def gotoAzmAlt ( self, coords ):
+		if self.stepIsPrecise:
+			self.gotoAzmAltPrecise( coords )
+		else:
+			self.gotoAzmAltCoarse( coords )
 
-		if self.isConnected:
-			ra = coords[0]
-			dec = coords[1]
 
-			hexRa  = hex( int( round( float( ra ))  / 360. * 16777216 ) )
-			hexDec = hex( int( round( float( dec )) / 360. * 16777216 ) )
 
-			cmd = 's' + ((str(hexRa)[2:]+'00').zfill(8) + ',' + (str(hexDec)[2:]+'00').zfill(8)).upper()
+	def gotoAzmAltCoarse ( self, coords ):
+		# Goto given coordinate, input values will be converted to 16bit hex. Units, degrees.
+		if self._sendPosition( 'gotoAzmAltCoarse', coords ) is None:
+			self._raise()
+
+
+	def gotoAzmAltPrecise ( self, coords ):
+		# Goto given coordinate, input values will be converted to 24bit hex. Units, degrees.
+		if self._sendPosition( 'gotoAzmAltPrecise', coords ) is None:
+			self._raise()
 
-			success = self.ser.write( str.encode( cmd ))
 
-			if success:
-				self.ser.read(1)
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
 
-		print("No device connected")
-		return 1
+	def gotoCommand ( self, coords, raDec = False ):
+		# The encoded goto gotoAzmAlt, or gotoRaDec with raDec, would send, mirror pointing included. Lets callers do
+		# the encoding and numpy work ahead of time and send later with sendGoto. Returns bytes.
+		if raDec and not self.isTelescope:
+			coords, raDec = self.mirrorPointing( coords ), False
+		name = ( 'gotoRaDec' if raDec else 'gotoAzmAlt' ) + ( 'Precise' if self.stepIsPrecise else 'Coarse' )
+		return bytes( synscancodec.encodePosition( name, coords ))
+
+
+	def sendGoto ( self, cmd ):
+		# Send a goto built by gotoCommand and wait for the ack
+		generation = self._motionGeneration()
+		self.invalidate()
+		if self._exchange( cmd, REPLY_ACK, 1, self.TIMEOUT_GOTO, generation = generation ) is None:
+			self._raise()
+
+
+	def syncRaDec ( self, coords ):
+		if self.stepIsPrecise:
+			self.syncRaDecPrecise( coords )
+		else:
+			self.syncRaDecCoarse( coords )
+
+
+
+
+	def syncRaDecCoarse ( self, coords ):
+		# Sync current pointing to the given coordinates, 16bit. Units, degrees.
+		if self._sendPosition( 'syncRaDecCoarse', coords ) is None:
+			self._raise()
+
 
+	def syncRaDecPrecise ( self, coords ):
+		# Sync current pointing to the given coordinates, 24bit. Units, degrees.
+		if self._sendPosition( 'syncRaDecPrecise', coords ) is None:
+			self._raise()
 
  
 	# def getTrackingMode ( self ): # BUG Doesn't work, mount does not reply according to the specs
@@ -374,25 +843,15 @@ class SynScanAZ ( object ):
 		# 1 = Alt/Az tracking
 		# 2 = Equatorial tracking
 		# 3 = PEC mode ( sidereal + PEC )
+		if int(mode) > 3:
+			raise ValueError("Argument error, possible values are\n0 = tracking off\n1 = Alt/Az tracking\n2 = Equatorial tracking\n3 = PEC mode ( sidereal + PEC )")
 
-		if self.ser.isOpen():
-			if int(mode) > 3:
-				print("Argument error, possible values are\n0 = tracking off\n1 = Alt/Az tracking\n2 = Equatorial tracking\n3 = PEC mode ( sidereal + PEC )")
-
-			self.trackingMode = int( mode )
-			
-			response = 0
-			cmd = 'T'+str( chr(mode))
-			success = self.ser.write( str.encode( cmd ))
+		generation = self._motionGeneration() if int( mode ) else None
+		self.invalidate()
+		if self._exchange( bytes( ( 0x54, int( mode ) ) ), REPLY_ACK, 1, self.TIMEOUT_GOTO, generation = generation ) is None:
+			self._raise()
 
-			if success:
-				response = self.ser.read(1)
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-				return 1
-
-		print("No device connected")
+		self.trackingMode = int( mode )
 
 
 
@@ -410,38 +869,20 @@ class SynScanAZ ( object ):
 
 	def isSlewing ( self ):
 		# Checks if the mount is still slewing to target
+		slewing = self._cached( "isSlewing", self._readSlewing )
 
-		if self.isConnected:
-			response = 0
-			success = self.ser.write(str.encode('L'))
-
-			if success:
-				response = self.ser.read(2)[:-1]
-				slews = int( response )
-				return bool(slews)
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-				return 1
+		if slewing is None:
+			self._raise()
 
-		print("No device connected")
-		return 1
+		return slewing
 
 
 
 	def cancelGoto ( self ):
 		# Cancel on-going GOTO action and set mount to idle
-
-		if self.isConnected:
-			response = 0
-			success = self.ser.write(str.encode('M'))
-
-			if success:
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-
-		print("No device connected")
-		return 1
+		self.invalidate()
+		if self._exchange( b'M', REPLY_ACK, 1, self.TIMEOUT_GOTO ) is None:
+			self._raise()
 
 
 
@@ -449,182 +890,258 @@ class SynScanAZ ( object ):
 	def setVariableAzmRatePos ( self, rate ):
 		# Set variable azimuthal rate to positive direction, units arcsec/sec 
 		# Disable tracking first
-		return 0
+		self._setVariableRate( synscancodec.AXIS_AZM, True, rate )
 
 	def setVariableAzmRateNeg ( self, rate ):
 		# Set variable azimuthal rate to negative direction, units arcsec/sec
 		# Disable tracking first
-		return 0
+		self._setVariableRate( synscancodec.AXIS_AZM, False, rate )
 
 	def setVariableAltRatePos ( self, rate ):
 		# Set variable altitudinal rate to positive direction, units arcsec/sec
 		# Disable tracking first
-		return 0
+		self._setVariableRate( synscancodec.AXIS_ALT, True, rate )
 
 	def setVariableAltRateNeg ( self, rate ):
 		# Set variable altitudinal tracking rate to negative direction, units arcsec/sec
 		# Disable tracking first
-		return 0
+		self._setVariableRate( synscancodec.AXIS_ALT, False, rate )
 
 	def setFixedAzmRatePos ( self, rate ):
-		# Set variable azimuthal rate to positive direction, units arcsec/sec
+		# Set fixed azimuthal rate to positive direction, hand controller rate 0-9, 0 stops
 		# Disable tracking first
-		return 0
+		self._setFixedRate( synscancodec.AXIS_AZM, True, rate )
 
 	def setFixedAzmRateNeg ( self, rate ):
-		# Set variable azimuthal rate to negative direction, units arcsec/sec
+		# Set fixed azimuthal rate to negative direction, hand controller rate 0-9, 0 stops
 		# Disable tracking first
-		return 0
+		self._setFixedRate( synscancodec.AXIS_AZM, False, rate )
 
 	def setFixedAltRatePos ( self, rate ):
-		# Set variable altitudinal rate to positive direction, units arcsec/sec
+		# Set fixed altitudinal rate to positive direction, hand controller rate 0-9, 0 stops
 		# Disable tracking first
-		return 0
+		self._setFixedRate( synscancodec.AXIS_ALT, True, rate )
 
 	def setFixedAltRateNeg ( self, rate ):
-		# Set variable altitudinal tracking rate to negative direction, units arcsec/sec
+		# Set fixed altitudinal rate to negative direction, hand controller rate 0-9, 0 stops
 		# Disable tracking first
-		return 0
+		self._setFixedRate( synscancodec.AXIS_ALT, False, rate )
+
+
+
+	def _setVariableRate ( self, axis, positive, rate ):
+		if not 0 <= rate <= synscancodec.MAX_VARIABLE_RATE:
+			raise ValueError("Argument error, variable rate must be 0 - %g arcsec/sec"%synscancodec.MAX_VARIABLE_RATE)
+
+		self._sendRate( synscancodec.encodeVariableRate( axis, positive, rate ), rate != 0 )
+
+
+
+	def _setFixedRate ( self, axis, positive, rate ):
+		if int(rate) not in range( 10 ):
+			raise ValueError("Argument error, possible values are 0 - 9")
+
+		self._sendRate( synscancodec.encodeFixedRate( axis, positive, int( rate )), int( rate ) != 0 )
+
+
+
+	def _sendRate ( self, cmd, moving = True ):
+		# The motor controllers ignore rate commands while the hand controller tracks, so tracking goes off once
+		# before an axis is set moving. A stop leaves tracking as it is.
+		generation = self._motionGeneration() if moving else None
+		with self.lock:
+			if moving and self.trackingMode != 0:
+				self.setTrackingMode(0)
+
+			self.invalidate()
+			if self._exchange( cmd, REPLY_ACK, 1, self.TIMEOUT_GOTO, generation = generation ) is None:
+				self._raise()
+
+
+
+	# Direct motor controller access through passthrough. Axes are synscancodec.AXIS_AZM and AXIS_ALT.
+
+	def getAxisPosition ( self, axis ):
+		# Position of one motor controller, units degrees
+		response = self._exchange( synscancodec.POSITION_QUERIES[axis], synscancodec.REPLY_PASSTHROUGH[3], 4, self.TIMEOUT_POSITION, binary = True )
+
+		if response is None:
+			self._raise()
+
+		return synscancodec.decodeAxisPosition( response )
+
+
+
+	def getAxisPositions ( self ):
+		# Both motor controller positions with one write. Returns [azm, alt], units degrees.
+		positions = self._cached( "axes", self._readAxisPositions )
+
+		if positions is None:
+			self._raise()
+
+		return list( positions )
+
+
+
+	def _readAxisPositions ( self ):
+		if not self.isConnected:
+			return self._fail( NOT_CONNECTED, b'P', b'' )
+
+		queries = synscancodec.POSITION_QUERIES
+		replyFormat = synscancodec.REPLY_PASSTHROUGH[3]
+
+		with self.lock:
+			try:
+				start = perf_counter()
+
+				if self.ser.timeout != self.TIMEOUT_POSITION:
+					self.ser.timeout = self.TIMEOUT_POSITION
+
+				if not self.ser.write( queries[ synscancodec.AXIS_AZM ] + queries[ synscancodec.AXIS_ALT ] ):
+					self.statistics.recordWriteFailure( "P" )
+					return self._fail( TIMEOUT, b'P', b'' )
+
+				azm = self._readReply( b'P', replyFormat, 4, binary = True )
+				if azm is None:
+					return None
+
+				alt = self._readReply( b'P', replyFormat, 4, binary = True )
+				if alt is None:
+					return None
+
+				self.statistics.record( "P", perf_counter() - start )
+
+				return ( synscancodec.decodeAxisPosition( azm ), synscancodec.decodeAxisPosition( alt ))
+			except _SERIAL_ERRORS:
+				return self._lost( b'P' )
+
+
+
+	def readAxes ( self ):
+		# [azm, alt] for closed-loop control, from the motor controllers in direct mode. Units, degrees.
+		if self.direct:
+			return self.getAxisPositions()
+		return self.getAzmAltPrecise()
+
+
+
+	def setAxisRate ( self, axis, rate ):
+		# Slew one axis at a signed variable rate, units arcsec/sec, 0 stops
+		self._setVariableRate( axis, rate >= 0, abs( rate ))
+
+
+
+	def startAxis ( self, axis, rate ):
+		# Slew one axis at a signed hand controller rate -9 - 9
+		self._setFixedRate( axis, rate >= 0, abs( rate ))
+
+
+
+	def stopAxis ( self, axis ):
+		self._setFixedRate( axis, True, 0 )
+
+
 
 	def getGeoLocation ( self ):
-		# Get geographical location stored on the mount
-		if self.isConnected:
-			response = 0
-			success = ser.write(str.encode('w'))
+		# Get geographical location stored on the mount. Returns [longitude, latitude], units degrees
+		response = self._exchange( b'w', REPLY_8BYTES, 9, self.TIMEOUT_DEFAULT, binary = True )
 
-			if success:
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-				return 1
-		return 1
+		if response is None:
+			self._raise()
+
+		return synscancodec.decodeLocation( response )
 
 
 	def setGeoLocation ( self, geoCoords):
 		# Set geographical location on the mount, units degrees
-		if self.isConnected:
-			self.longitude = geoCoords[0]
-			self.latitude = geoCoords[1]
+		self.longitude = geoCoords[0]
+		self.latitude = geoCoords[1]
+		self.site = None
 
-			response = 0
-			success = self.ser.write(str.encode('W'))
+		cmd = synscancodec.encodeLocation( self.longitude, self.latitude )
 
-			if success:
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-		print("No device connected")
-		return 1
+		if self._exchange( cmd, REPLY_ACK, 1, self.TIMEOUT_DEFAULT ) is None:
+			self._raise()
 
 
 
 	def getTime ( self ):
-		# Get current time stored on the mount
-		if self.isConnected:
-			response = 0
-			success = self.ser.write(str.encode('h'))
+		# Get current time stored on the mount. Returns [hour, minute, second, month, day, year, utc offset, dst]
+		response = self._exchange( b'h', REPLY_8BYTES, 9, self.TIMEOUT_DEFAULT, binary = True )
 
-			if success:
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-		return 1
+		if response is None:
+			self._raise()
+
+		return synscancodec.decodeTime( response )
 
 
 	def setTime ( self):
-		# Set the mount time, units...
-		if self.isConnected:
-			response = 0
-			success = self.ser.write(str.encode('H'))
+		# Set the mount time to the local time of this computer
+		cmd = synscancodec.encodeTime( localtime() )
 
-			if success:
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-		return 1
+		if self._exchange( cmd, REPLY_ACK, 1, self.TIMEOUT_DEFAULT ) is None:
+			self._raise()
 
 
 	def getVersion ( self ):
-		# Get hand controller firmware version
-		if self.isConnected:
-			response = 0 
-			success = self.ser.write(str.encode('V'))
+		# Get hand controller firmware version, e.g. '4.37.07'
+		response = self._exchange( b'V', REPLY_VERSION, 7, self.TIMEOUT_DEFAULT )
 
-			if success:
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-		return 1
+		if response is None:
+			self._raise()
 
+		return synscancodec.decodeVersion( response )
 
-	def getDeviceVersion ( self ):
-		# Get motor controller firmware version
-		if self.isConnected:
-			response = 0
-			success = self.ser.write(str.encode('P'))
 
-			if success:
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-		return 1
+	def getDeviceVersion ( self, axis = synscancodec.AXIS_AZM ):
+		# Get motor controller firmware version, e.g. '7.11'
+		response = self._exchange( synscancodec.VERSION_QUERIES[axis], synscancodec.REPLY_PASSTHROUGH[2], 3, self.TIMEOUT_STATUS, binary = True )
+
+		if response is None:
+			self._raise()
+
+		return "%d.%d"%( response[0], response[1] )
 
 
 	def getModel ( self ):
 		# Get mount model
-		if self.isConnected:
-			response = 0 
-			success = self.ser.write(str.encode('m'))
+		response = self._exchange( b'm', REPLY_BYTE, 2, self.TIMEOUT_STATUS, binary = True )
 
-			if success:
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-		return 1
+		if response is None:
+			self._raise()
+
+		return response[0]
 
 
 	def echo ( self, echo ):
 		# Mount replies what you shout
-		if self.isConnected:
-			response = 0
-			success = self.ser.write(str.encode('K'))
+		response = self._exchange( b'K' + str.encode( echo )[:1], REPLY_BYTE, 2, self.TIMEOUT_DEFAULT, binary = True )
 
-			if success:
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-		return 1
+		if response is None:
+			self._raise()
+
+		return response[:1].decode( 'latin-1' )
 
 
 	def isAlignmentComplete ( self ):
 		# Check is the alignment value has been set to completed (if somebedy answered "Yes" on the remote >:))
-		if self.isConnected:
-			response = 0
-			success = self.ser.write(str.encode('J'))
+		response = self._exchange( b'J', REPLY_BYTE, 2, self.TIMEOUT_STATUS, binary = True )
 
-			if success:
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
+		if response is None:
+			self._raise()
 
-			isComplete = self.ser.read(1)
-
-			self.alignmentCompleted = isComplete
-			return 0
-		return 1
+		self.alignmentCompleted = bool( response[0] )
+		return self.alignmentCompleted
 
 
 
 
 	def getMountPointingState ( self ):
 		# Returns either E(ast) or W(est)
-		if self.isConnected:
-			response = 0
-			success = self.ser.write(str.encode('p'))
+		response = self._exchange( b'p', REPLY_BYTE, 2, self.TIMEOUT_STATUS, binary = True )
 
-			if success:
-				return 0
-			else:
-				print("Communication failure in ", inspect.stack()[0][3])
-		return
+		if response is None:
+			self._raise()
+
+		return response[:1].decode( 'latin-1' )
 
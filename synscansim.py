@@ -0,0 +1,479 @@
+import calendar
+import math
+import os
+import pty
+import random
+import select
+import threading
+import tty
+from time import monotonic, sleep, time, gmtime
+
+
+# Sidereal rate in degrees per second
+SIDEREAL_RATE = 360. / 86164.0905
+
+# Fixed slew rates 0-9 as multiples of sidereal rate, index is the hand controller rate number
+FIXED_RATES = [ 0, 1, 2, 8, 16, 32, 64, 400, 600, 800 ]
+
+# Passthrough destinations and message ids understood by the simulated motor controllers
+AXIS_AZM = 16
+AXIS_ALT = 17
+MC_GET_POSITION = 0x01
+MC_SET_POS_VARIABLE = 0x06
+MC_SET_NEG_VARIABLE = 0x07
+MC_MOVE_POS = 0x24
+MC_MOVE_NEG = 0x25
+MC_GET_VERSION = 0xFE
+
+# Command lengths in bytes, including the command character
+COMMAND_LENGTHS = {
+					b'E' : 1, b'e' : 1, b'Z' : 1, b'z' : 1,
+					b'R' : 10, b'r' : 18, b'B' : 10, b'b' : 18, b'S' : 10, b's' : 18,
+					b'L' : 1, b'M' : 1, b'T' : 2, b't' : 1, b'J' : 1, b'V' : 1, b'm' : 1,
+					b'K' : 2, b'P' : 8, b'w' : 1, b'W' : 9, b'h' : 1, b'H' : 9, b'p' : 1,
+				}
+
+
+
+class VirtualClock ( object ):
+	"""Wall clock running acceleration times faster than real time, used for every mount dynamic."""
+
+	def __init__ ( self, acceleration = 1., start = None ):
+		self.acceleration = float( acceleration )
+		self.start = time() if start is None else start
+		self._origin = monotonic()
+
+	def now ( self ):
+		# Virtual unix time in seconds
+		return self.start + ( monotonic() - self._origin ) * self.acceleration
+
+	def set ( self, now ):
+		# Jump the virtual clock to the given unix time
+		self.start = now
+		self._origin = monotonic()
+
+
+
+def localSiderealTime ( unixTime, longitude ):
+	# Local sidereal time in degrees
+	days = unixTime / 86400. - 10957.5	# Days since J2000.0
+	return ( 280.46061837 + 360.98564736629 * days + longitude ) % 360.
+
+
+
+def equatorialToHorizontal ( ra, dec, latitude, lst ):
+	# All units degrees, azimuth from north towards east. Returns [azm, alt]
+	h = math.radians( lst - ra )
+	dec = math.radians( dec )
+	lat = math.radians( latitude )
+
+	alt = math.asin( math.sin(dec)*math.sin(lat) + math.cos(dec)*math.cos(lat)*math.cos(h) )
+	azm = math.atan2( -math.cos(dec)*math.sin(h), math.sin(dec)*math.cos(lat) - math.cos(dec)*math.sin(lat)*math.cos(h) )
+
+	return [ math.degrees(azm) % 360., math.degrees(alt) ]
+
+
+
+def horizontalToEquatorial ( azm, alt, latitude, lst ):
+	# All units degrees, azimuth from north towards east. Returns [ra, dec]
+	azm = math.radians( azm )
+	alt = math.radians( alt )
+	lat = math.radians( latitude )
+
+	dec = math.asin( math.sin(alt)*math.sin(lat) + math.cos(alt)*math.cos(lat)*math.cos(azm) )
+	h = math.atan2( -math.sin(azm)*math.cos(alt), math.sin(alt)*math.cos(lat) - math.cos(alt)*math.sin(lat)*math.cos(azm) )
+
+	return [ ( lst - math.degrees(h) ) % 360., math.degrees(dec) ]
+
+
+
+class SimulatedMount ( object ):
+	"""Alt-az mount model: goto slews at per-axis rates, manual axis rates, sidereal tracking with drift and periodic error."""
+
+	def __init__ ( self, clock = None, latitude = 60.17, longitude = 24.94, azmRate = 4., altRate = 4., driftRate = 0., periodicError = 0., periodicPeriod = 480. ):
+		self.clock = clock if clock is not None else VirtualClock()
+		self.latitude = latitude
+		self.longitude = longitude
+		self.azmRate = azmRate						# Goto slew rates, degrees per second
+		self.altRate = altRate
+		self.driftRate = driftRate					# Tracking drift, arcsec per second
+		self.periodicError = periodicError			# Periodic error amplitude, arcsec
+		self.periodicPeriod = periodicPeriod		# Periodic error period, seconds
+
+		self.azm = 0.
+		self.alt = 0.
+		self.trackingMode = 0
+		self.alignmentComplete = True
+
+		self._target = None							# [azm, alt] goto target or None
+		self._targetRaDec = None					# [ra, dec] goto/track target on the sky or None
+		self._axisRates = [ 0., 0. ]				# Manual azm and alt rates, degrees per second
+		self._raOffset = 0.							# Sync offsets applied to reported RA/Dec
+		self._decOffset = 0.
+		self._trackStart = None
+		self._last = self.clock.now()
+		self._lock = threading.Lock()
+
+
+
+	def lst ( self, now = None ):
+		return localSiderealTime( self.clock.now() if now is None else now, self.longitude )
+
+
+
+	def update ( self ):
+		# Advance the model to the current virtual time
+		with self._lock:
+			now = self.clock.now()
+			dt = now - self._last
+			self._last = now
+
+			if self._target is not None:
+				if self._targetRaDec is not None:
+					self._target = equatorialToHorizontal( self._targetRaDec[0], self._targetRaDec[1], self.latitude, self.lst( now ) )
+
+				dAzm = ( self._target[0] - self.azm + 180. ) % 360. - 180.
+				dAlt = self._target[1] - self.alt
+				stepAzm = self.azmRate * dt
+				stepAlt = self.altRate * dt
+
+				self.azm = ( self.azm + max( -stepAzm, min( stepAzm, dAzm ))) % 360.
+				self.alt = self.alt + max( -stepAlt, min( stepAlt, dAlt ))
+
+				if abs( dAzm ) <= stepAzm and abs( dAlt ) <= stepAlt:
+					self._target = None
+					self._trackStart = now
+
+			elif self._axisRates[0] or self._axisRates[1]:
+				self.azm = ( self.azm + self._axisRates[0] * dt ) % 360.
+				self.alt = max( -90., min( 90., self.alt + self._axisRates[1] * dt ))
+
+			elif self.trackingMode != 0 and self._targetRaDec is not None:
+				azm, alt = equatorialToHorizontal( self._targetRaDec[0], self._targetRaDec[1], self.latitude, self.lst( now ) )
+				elapsed = now - ( self._trackStart if self._trackStart is not None else now )
+				error = ( self.driftRate * elapsed + self.periodicError * math.sin( 2 * math.pi * elapsed / self.periodicPeriod )) / 3600.
+				self.azm = ( azm + error ) % 360.
+				self.alt = alt + error
+
+
+
+	def isSlewing ( self ):
+		return self._target is not None
+
+
+
+	def getAzmAlt ( self ):
+		return [ self.azm % 360., self.alt % 360. ]
+
+
+
+	def getRaDec ( self ):
+		ra, dec = horizontalToEquatorial( self.azm, self.alt, self.latitude, self.lst() )
+		return [ ( ra + self._raOffset ) % 360., ( dec + self._decOffset ) % 360. ]
+
+
+
+	def gotoAzmAlt ( self, azm, alt ):
+		with self._lock:
+			self._targetRaDec = None
+			self._target = [ azm % 360., _signed( alt ) ]
+
+
+
+	def gotoRaDec ( self, ra, dec ):
+		with self._lock:
+			self._targetRaDec = [ ( ra - self._raOffset ) % 360., _signed( dec - self._decOffset ) ]
+			self._target = equatorialToHorizontal( self._targetRaDec[0], self._targetRaDec[1], self.latitude, self.lst() )
+
+
+
+	def syncRaDec ( self, ra, dec ):
+		with self._lock:
+			trueRa, trueDec = horizontalToEquatorial( self.azm, self.alt, self.latitude, self.lst() )
+			self._raOffset = ( ra - trueRa ) % 360.
+			self._decOffset = _signed( dec ) - trueDec
+
+
+
+	def cancelGoto ( self ):
+		with self._lock:
+			self._target = None
+			self._axisRates = [ 0., 0. ]
+
+
+
+	def setTrackingMode ( self, mode ):
+		with self._lock:
+			self.trackingMode = mode
+			if mode != 0 and self._targetRaDec is None:
+				self._targetRaDec = horizontalToEquatorial( self.azm, self.alt, self.latitude, self.lst() )
+			self._trackStart = self.clock.now()
+
+
+
+	def setAxisRate ( self, axis, rate ):
+		# Manual axis rate in degrees per second, a nonzero rate cancels the goto and sky target
+		with self._lock:
+			self._axisRates[ axis ] = rate
+			if rate:
+				self._target = None
+				self._targetRaDec = None
+
+
+
+	def getAxisPosition ( self, axis ):
+		return self.azm % 360. if axis == 0 else self.alt % 360.
+
+
+
+class SynScanSimulator ( object ):
+	"""Serves the SynScan hand controller protocol for a SimulatedMount over a pseudo-terminal."""
+
+	def __init__ ( self, mount = None, baud = 9600, processingDelay = 0.002, garbleRate = 0. ):
+		self.mount = mount if mount is not None else SimulatedMount()
+		self.baud = baud							# None disables byte timing
+		self.processingDelay = processingDelay		# Hand controller turnaround, real seconds
+		self.garbleRate = garbleRate				# Fraction of replies truncated, for framing tests
+		self.commandCount = 0
+		self.port = None
+
+		self._master = None
+		self._slave = None
+		self._running = False
+		self._thread = None
+
+
+
+	def start ( self ):
+		# Open the pty and start serving. Returns the port path to hand to SynScanAZ.
+		self._master, self._slave = pty.openpty()
+		tty.setraw( self._slave )
+		self.port = os.ttyname( self._slave )
+		self._running = True
+		self._thread = threading.Thread( target = self._serve, name = "SynScanSimulator", daemon = True )
+		self._thread.start()
+		return self.port
+
+
+
+	def stop ( self ):
+		self._running = False
+		if self._thread is not None:
+			self._thread.join()
+		os.close( self._master )
+		os.close( self._slave )
+
+
+
+	def __enter__ ( self ):
+		self.start()
+		return self
+
+
+
+	def __exit__ ( self, *exc ):
+		self.stop()
+
+
+
+	def _serve ( self ):
+		pending = b''
+
+		while self._running:
+			ready, _, _ = select.select( [ self._master ], [], [], 0.05 )
+			if not ready:
+				continue
+
+			pending += os.read( self._master, 1024 )
+
+			while pending:
+				length = COMMAND_LENGTHS.get( pending[:1] )
+				if length is None:
+					pending = pending[1:]		# Unknown byte, the real controller ignores it as well
+					continue
+				if len( pending ) < length:
+					break
+
+				cmd, pending = pending[:length], pending[length:]
+				self._reply( cmd, self.handle( cmd ))
+
+
+
+	def _reply ( self, cmd, reply ):
+		if self.garbleRate and random.random() < self.garbleRate:
+			reply = reply[ : random.randrange( len(reply) ) ]
+
+		if self.baud:
+			sleep( ( len(cmd) + len(reply) ) * 10. / self.baud + self.processingDelay )
+
+		os.write( self._master, reply )
+
+
+
+	def handle ( self, cmd ):
+		# Execute one complete command and return the reply bytes
+		mount = self.mount
+		mount.update()
+		self.commandCount += 1
+		c = cmd[:1]
+
+		if c in ( b'E', b'Z' ):
+			first, second = mount.getRaDec() if c == b'E' else mount.getAzmAlt()
+			return ( '%04X,%04X#'%( _counts( first, 16 ), _counts( second, 16 ))).encode()
+
+		if c in ( b'e', b'z' ):
+			first, second = mount.getRaDec() if c == b'e' else mount.getAzmAlt()
+			return ( '%06X00,%06X00#'%( _counts( first, 24 ), _counts( second, 24 ))).encode()
+
+		if c in ( b'R', b'r', b'B', b'b', b'S', b's' ):
+			bits = 16 if c.isupper() else 24
+			first, second = _degrees( cmd[1:], bits )
+			if c in ( b'R', b'r' ):
+				mount.gotoRaDec( first, second )
+			elif c in ( b'B', b'b' ):
+				mount.gotoAzmAlt( first, second )
+			else:
+				mount.syncRaDec( first, second )
+			return b'#'
+
+		if c == b'L':
+			return b'1#' if mount.isSlewing() else b'0#'
+
+		if c == b'M':
+			mount.cancelGoto()
+			return b'#'
+
+		if c == b'T':
+			mount.setTrackingMode( cmd[1] )
+			return b'#'
+
+		if c == b't':
+			return bytes( [ mount.trackingMode ] ) + b'#'
+
+		if c == b'J':
+			return bytes( [ int( mount.alignmentComplete ) ] ) + b'#'
+
+		if c == b'V':
+			return b'042507#'
+
+		if c == b'm':
+			return bytes( [ 128 ] ) + b'#'	# AZ GOTO
+
+		if c == b'K':
+			return cmd[1:2] + b'#'
+
+		if c == b'p':
+			return b'W#'
+
+		if c == b'P':
+			return self._passthrough( cmd )
+
+		if c == b'w':
+			return _location( mount.latitude, mount.longitude ) + b'#'
+
+		if c == b'W':
+			d = cmd[1:]
+			latitude = d[0] + d[1] / 60. + d[2] / 3600.
+			longitude = d[4] + d[5] / 60. + d[6] / 3600.
+			mount.latitude = -latitude if d[3] else latitude
+			mount.longitude = -longitude if d[7] else longitude
+			return b'#'
+
+		if c == b'h':
+			t = gmtime( mount.clock.now() )
+			return bytes( [ t.tm_hour, t.tm_min, t.tm_sec, t.tm_mon, t.tm_mday, t.tm_year - 2000, 0, 0 ] ) + b'#'
+
+		if c == b'H':
+			d = cmd[1:]
+			mount.clock.set( calendar.timegm( ( 2000 + d[5], d[3], d[4], d[0], d[1], d[2], 0, 0, 0 )) - _signedByte( d[6] ) * 3600 )
+			return b'#'
+
+		return b'#'
+
+
+
+	def _passthrough ( self, cmd ):
+		# 'P' length dest msgId data1 data2 data3 replyLength
+		length, dest, msgId = cmd[1], cmd[2], cmd[3]
+		data = cmd[ 4 : 4 + length - 1 ]
+		replyLength = cmd[7]
+		axis = 0 if dest == AXIS_AZM else 1
+		reply = b''
+
+		if msgId in ( MC_SET_POS_VARIABLE, MC_SET_NEG_VARIABLE ):
+			# Rate in quarter arcsec per second, big endian
+			rate = int.from_bytes( data, 'big' ) / 4. / 3600.
+			self.mount.setAxisRate( axis, rate if msgId == MC_SET_POS_VARIABLE else -rate )
+
+		elif msgId in ( MC_MOVE_POS, MC_MOVE_NEG ):
+			rate = FIXED_RATES[ min( data[0], 9 ) ] * SIDEREAL_RATE
+			self.mount.setAxisRate( axis, rate if msgId == MC_MOVE_POS else -rate )
+
+		elif msgId == MC_GET_POSITION:
+			reply = _counts( self.mount.getAxisPosition( axis ), 24 ).to_bytes( 3, 'big' )
+
+		elif msgId == MC_GET_VERSION:
+			reply = bytes( [ 7, 11 ] )
+
+		return ( reply + bytes( replyLength ))[ : replyLength ] + b'#'
+
+
+
+def _counts ( degrees, bits ):
+	return int( round( degrees % 360. / 360. * ( 1 << bits ))) % ( 1 << bits )
+
+
+
+def _degrees ( payload, bits ):
+	# Decode 'XXXX,XXXX' or 'XXXXXXXX,XXXXXXXX' into two angles in degrees
+	first, second = payload.split( b',' )
+	scale = 360. / ( 1 << 32 if bits == 24 else 1 << 16 )
+	return [ int( first, 16 ) * scale, int( second, 16 ) * scale ]
+
+
+
+def _signed ( degrees ):
+	# Wrap into -180..180
+	return ( degrees + 180. ) % 360. - 180.
+
+
+
+def _signedByte ( value ):
+	return value - 256 if value > 127 else value
+
+
+
+def _location ( latitude, longitude ):
+	def dms ( value ):
+		value = abs( value )
+		d = int( value )
+		m = int( ( value - d ) * 60 )
+		s = int( round( ( value - d - m / 60. ) * 3600 )) % 60
+		return [ d, m, s ]
+
+	return bytes( dms( latitude ) + [ int( latitude < 0 ) ] + dms( longitude ) + [ int( longitude < 0 ) ] )
+
+
+
+if __name__ == "__main__":
+	import argparse
+
+	parser = argparse.ArgumentParser( description = "Simulated SynScan hand controller on a pseudo-terminal" )
+	parser.add_argument( "--accel", type = float, default = 1., help = "virtual clock acceleration" )
+	parser.add_argument( "--baud", type = int, default = 9600, help = "modelled line speed, 0 disables byte timing" )
+	parser.add_argument( "--latitude", type = float, default = 60.17 )
+	parser.add_argument( "--longitude", type = float, default = 24.94 )
+	parser.add_argument( "--slew-rate", type = float, default = 4., help = "goto slew rate per axis, degrees per second" )
+	parser.add_argument( "--drift", type = float, default = 0., help = "tracking drift, arcsec per second" )
+	parser.add_argument( "--garble", type = float, default = 0., help = "fraction of replies to truncate" )
+	args = parser.parse_args()
+
+	mount = SimulatedMount( VirtualClock( args.accel ), args.latitude, args.longitude, args.slew_rate, args.slew_rate, args.drift )
+	simulator = SynScanSimulator( mount, args.baud or None, garbleRate = args.garble )
+	print( simulator.start(), flush = True )
+
+	try:
+		while True:
+			sleep( 1 )
+	except KeyboardInterrupt:
+		simulator.stop()
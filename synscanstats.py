@@ -0,0 +1,156 @@
+import threading
+from bisect import bisect_left
+
+
+# Latency histogram bucket upper bounds in seconds, one more bucket catches everything above
+LATENCY_BUCKETS = ( 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1., 2., 5. )
+
+# Commands that get their counters allocated up front
+KNOWN_COMMANDS = "EeZzRrBbSsLMTtJVmKPwWhHp"
+
+
+
+class CommandStats ( object ):
+	"""Counters and latency histogram for one command. Everything is allocated here so recording does not allocate."""
+
+	__slots__ = ( "count", "timeouts", "garbled", "writeFailures", "observations", "latencySum", "buckets" )
+
+	def __init__ ( self ):
+		self.count = 0				# Every attempt
+		self.timeouts = 0			# Reply shorter than expected when the budget ran out
+		self.garbled = 0			# Reply of full length or terminated, but malformed
+		self.writeFailures = 0
+		self.observations = 0		# Successful replies, these make up the histogram
+		self.latencySum = 0.
+		self.buckets = [0] * ( len( LATENCY_BUCKETS ) + 1 )
+
+
+
+	def asDict ( self ):
+		return {
+					"count"			: self.count,
+					"timeouts"		: self.timeouts,
+					"garbled"		: self.garbled,
+					"writeFailures"	: self.writeFailures,
+					"observations"	: self.observations,
+					"latencySum"	: self.latencySum,
+					"buckets"		: list( self.buckets ),
+				}
+
+
+
+class MountStats ( object ):
+	"""Per-command counters for a SynScanAZ link, keyed by command character ('status' for the batched query)."""
+
+	def __init__ ( self ):
+		self.commands = { command : CommandStats() for command in KNOWN_COMMANDS }
+		self.commands["status"] = CommandStats()
+
+
+
+	def _get ( self, command ):
+		stats = self.commands.get( command )
+		if stats is None:
+			stats = self.commands[command] = CommandStats()
+		return stats
+
+
+
+	def record ( self, command, latency ):
+		# Successful exchange, latency in seconds
+		stats = self._get( command )
+		stats.count += 1
+		stats.observations += 1
+		stats.latencySum += latency
+		stats.buckets[ bisect_left( LATENCY_BUCKETS, latency ) ] += 1
+
+
+
+	def recordTimeout ( self, command ):
+		stats = self._get( command )
+		stats.count += 1
+		stats.timeouts += 1
+
+
+
+	def recordGarbled ( self, command ):
+		stats = self._get( command )
+		stats.count += 1
+		stats.garbled += 1
+
+
+
+	def recordWriteFailure ( self, command ):
+		stats = self._get( command )
+		stats.count += 1
+		stats.writeFailures += 1
+
+
+
+	def asDict ( self ):
+		# Plain dict of the commands that have been used
+		return { command : stats.asDict() for command, stats in self.commands.items() if stats.count }
+
+
+
+	def prometheus ( self ):
+		# Render the counters in Prometheus text exposition format
+		lines = []
+		used = [ ( _label( command ), stats ) for command, stats in sorted( self.commands.items() ) if stats.count ]
+
+		for name, attribute, description in (
+					( "synscan_commands_total", "count", "Commands sent to the mount" ),
+					( "synscan_command_timeouts_total", "timeouts", "Replies that did not arrive within the budget" ),
+					( "synscan_command_garbled_total", "garbled", "Replies that arrived malformed" ),
+					( "synscan_command_write_failures_total", "writeFailures", "Commands that could not be written" ),
+				):
+			lines.append( "# HELP %s %s"%( name, description ))
+			lines.append( "# TYPE %s counter"%name )
+			for label, stats in used:
+				lines.append( '%s{command="%s"} %d'%( name, label, getattr( stats, attribute )) )
+
+		name = "synscan_command_latency_seconds"
+		lines.append( "# HELP %s Round-trip time of successful commands"%name )
+		lines.append( "# TYPE %s histogram"%name )
+		for label, stats in used:
+			cumulative = 0
+			for bound, count in zip( LATENCY_BUCKETS, stats.buckets ):
+				cumulative += count
+				lines.append( '%s_bucket{command="%s",le="%g"} %d'%( name, label, bound, cumulative ))
+			lines.append( '%s_bucket{command="%s",le="+Inf"} %d'%( name, label, stats.observations ))
+			lines.append( '%s_sum{command="%s"} %.6f'%( name, label, stats.latencySum ))
+			lines.append( '%s_count{command="%s"} %d'%( name, label, stats.observations ))
+
+		return "\n".join( lines ) + "\n"
+
+
+
+def _label ( command ):
+	return command.replace( "\\", "\\\\" ).replace( '"', '\\"' )
+
+
+
+def serveMetrics ( mount, port = 9300, host = "127.0.0.1" ):
+	# Serve the mount counters on http://host:port/metrics in Prometheus format from a daemon thread. Returns the server.
+	# http.server is imported here, it is most of the import time of the serial layer otherwise.
+	from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+	class MetricsHandler ( BaseHTTPRequestHandler ):
+		def do_GET ( self ):
+			if self.path != "/metrics":
+				self.send_error( 404 )
+				return
+
+			body = mount.statistics.prometheus().encode()
+			self.send_response( 200 )
+			self.send_header( "Content-Type", "text/plain; version=0.0.4" )
+			self.send_header( "Content-Length", str( len( body )) )
+			self.end_headers()
+			self.wfile.write( body )
+
+		def log_message ( self, *args ):
+			pass
+
+	server = ThreadingHTTPServer( ( host, port ), MetricsHandler )
+	threading.Thread( target = server.serve_forever, name = "SynScanMetrics", daemon = True ).start()
+	return server
@@ -0,0 +1,141 @@
+import threading
+from collections import deque, namedtuple
+from time import monotonic, time
+
+from synscancodec import MAX_VARIABLE_RATE
+from synscanserial import MountError, MountStopped
+
+
+# One control cycle: unix time, pointing error and commanded rates. Errors in arcsec, rates in arcsec/sec.
+TrackingSample = namedtuple( "TrackingSample", [ "time", "azmError", "altError", "azmRate", "altRate" ] )
+
+
+
+class RateTracker ( object ):
+	"""Follows a trajectory by streaming per-axis variable rates to the mount at a fixed control frequency.
+
+	trajectory( unixTime ) returns the wanted [azm, alt] in degrees, e.g. synscancoords.Site.trajectory.
+	Every cycle reads the axes once, feeds forward the trajectory rate over the next cycle and removes
+	gain times the pointing error, so the mount moves smoothly instead of stepping from goto to goto.
+	"""
+
+	def __init__ ( self, mount, trajectory, frequency = 4., gain = 0.5, maxRate = MAX_VARIABLE_RATE, history = 3600 ):
+		self.mount = mount
+		self.trajectory = trajectory
+		self.frequency = frequency				# Control cycles per second, a cycle is ~40 bytes at 9600 baud
+		self.gain = gain						# Fraction of the pointing error removed per cycle
+		self.maxRate = maxRate					# arcsec/sec
+		self.history = deque( maxlen = history )
+
+		self.cycles = 0
+		self.failures = 0
+		self._rates = [ None, None ]			# Last commanded rates, arcsec/sec
+		self._setters = (
+							( mount.setVariableAzmRatePos, mount.setVariableAzmRateNeg ),
+							( mount.setVariableAltRatePos, mount.setVariableAltRateNeg ),
+						)
+
+		self._stopped = threading.Event()
+		self._thread = None
+		self._generation = None					# mount.stopGeneration at start(), an emergency stop ends the loop
+
+
+
+	def start ( self ):
+		# Start the control loop thread. Rates are sent afresh, the deadband compares against nothing.
+		self._generation = self.mount.stopGeneration
+		self._rates = [ None, None ]
+		self._stopped.clear()
+		self._thread = threading.Thread( target = self._run, name = "RateTracker", daemon = True )
+		self._thread.start()
+
+
+
+	def stop ( self ):
+		# Stop the control loop and both axes
+		self._stopped.set()
+		if self._thread is not None:
+			self._thread.join()
+			self._thread = None
+
+		# Past the deadband, a creep below it would otherwise be left running
+		for axis in ( 0, 1 ):
+			self._setRate( axis, 0., force = True )
+
+
+
+	def _run ( self ):
+		period = 1. / self.frequency
+		deadline = monotonic()
+
+		while not self._stopped.is_set():
+			try:
+				# A cycle whose rates fall in the deadband sends nothing to be refused, so check here as well
+				if self.mount.stopGeneration != self._generation:
+					raise MountStopped( b'P' )
+				with self.mount.issuedIn( self._generation ):
+					self.step( period )
+			except MountStopped:
+				# Emergency stop since start(), the mount stays stopped until the tracker is started again
+				print("Tracking ended by an emergency stop")
+				self._rates = [ None, None ]
+				return
+			except MountError as error:
+				self.failures += 1
+				print("Tracking cycle failed: %s"%error)
+
+			# Fixed rate schedule, a late cycle is not made up for
+			deadline = max( deadline + period, monotonic() )
+			self._stopped.wait( deadline - monotonic() )
+
+
+
+	def step ( self, period ):
+		# One control cycle, returns the TrackingSample
+		position = self.mount.readAxes()
+		now = time()
+		target = self.trajectory( now )
+		ahead = self.trajectory( now + period )
+
+		errors = []
+		for axis in ( 0, 1 ):
+			error = _wrap( target[axis] - position[axis] )
+			rate = ( _wrap( ahead[axis] - target[axis] ) + self.gain * error ) / period * 3600.
+			self._setRate( axis, max( -self.maxRate, min( self.maxRate, rate )) )
+			errors.append( error * 3600. )
+
+		self.cycles += 1
+		sample = TrackingSample( now, errors[0], errors[1], self._rates[0], self._rates[1] )
+		self.history.append( sample )
+		return sample
+
+
+
+	def _setRate ( self, axis, rate, force = False ):
+		# Skip the command when the rate sent in the quarter arcsec/sec steps the motor controller resolves is unchanged
+		last = self._rates[axis]
+		if not force and last is not None and round( rate * 4 ) == round( last * 4 ):
+			return
+
+		positive, negative = self._setters[axis]
+		if rate >= 0:
+			positive( rate )
+		else:
+			negative( -rate )
+		self._rates[axis] = rate
+
+
+
+	def rmsError ( self ):
+		# Root mean square pointing error over the history in arcsec, [azm, alt]
+		if not self.history:
+			return [ 0., 0. ]
+
+		n = len( self.history )
+		return [ ( sum( s.azmError ** 2 for s in self.history ) / n ) ** 0.5, ( sum( s.altError ** 2 for s in self.history ) / n ) ** 0.5 ]
+
+
+
+def _wrap ( degrees ):
+	# Wrap an angle difference into -180..180
+	return ( degrees + 180. ) % 360. - 180.
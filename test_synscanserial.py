@@ -0,0 +1,84 @@
+import threading
+import unittest
+from time import sleep, monotonic
+
+import synscancodec
+from synscanserial import SynScanAZ
+from synscansim import SynScanSimulator
+
+
+class CacheTransactionTest ( unittest.TestCase ):
+	"""Read cache against the simulator, run with python -m unittest."""
+
+	def setUp ( self ):
+		self.simulator = SynScanSimulator()
+		self.mount = SynScanAZ( self.simulator.start(), cacheTtl = 0.1 )
+
+	def tearDown ( self ):
+		self.mount.ser.close()
+		self.simulator.stop()
+
+	def testLockHolderDoesNotWaitOnFlight ( self ):
+		# A transaction holder reading a key whose flight leader is queued behind it on the mount lock
+		results = {}
+
+		def leader ( ):
+			results["leader"] = self.mount.getAzmAltPrecise()
+
+		def holder ( ):
+			with self.mount.transaction():
+				thread = threading.Thread( target = leader, daemon = True )
+				thread.start()
+				deadline = monotonic() + 2.
+				while "getAzmAltPrecise" not in self.mount._inflight and monotonic() < deadline:
+					sleep( 0.001 )
+				results["holder"] = self.mount.getAzmAltPrecise()
+			thread.join( 2. )
+
+		thread = threading.Thread( target = holder, daemon = True )
+		thread.start()
+		thread.join( 5. )
+
+		self.assertFalse( thread.is_alive(), "transaction holder deadlocked on the read cache" )
+		self.assertEqual( results["holder"], [ 0., 0. ] )
+		self.assertEqual( results["leader"], [ 0., 0. ] )
+
+
+
+class PositionFormatTest ( unittest.TestCase ):
+	"""Encode and decode round trips of the 16bit and 24bit position formats."""
+
+	VALUES = ( 0., 0.01, 0.5, 12.345678, 89.999, 180., 359.99, -0.01, -10.5, -89.9 )
+
+	def roundTrip ( self, position, first, second ):
+		# Encoded command as the reply the hand controller would send, decoded again
+		reply = bytes( position.encode( ord( 'b' ), first, second )[1:] ) + b'#'
+		self.assertIsNotNone( position.replyFormat.fullmatch( reply ))
+		return position.decode( reply )
+
+	def testRoundTrip ( self ):
+		for position in ( synscancodec.FORMAT_16BIT, synscancodec.FORMAT_24BIT ):
+			tolerance = 0.5 / position.scale
+			for value in self.VALUES:
+				decoded = self.roundTrip( position, value, value )
+				for degrees in decoded:
+					error = ( degrees - value + 180. ) % 360. - 180.
+					self.assertLessEqual( abs( error ), tolerance + 1e-12, "%d bit, %r decoded as %r"%( position.bits, value, degrees ))
+
+	def testNegativeAltitudeWraps ( self ):
+		# Negative angles go out as the equivalent counts below a full rotation
+		for position in ( synscancodec.FORMAT_16BIT, synscancodec.FORMAT_24BIT ):
+			self.assertEqual( position.toCounts( -10.5 ), position.toCounts( 349.5 ))
+			self.assertEqual( position.toCounts( 360. ), 0 )
+
+	def testSubDegreePrecision ( self ):
+		# Scaling before rounding keeps a 24bit step, about 0.08 arcsec
+		position = synscancodec.FORMAT_24BIT
+		self.assertEqual( position.toCounts( 1. / position.scale ), 1 )
+		self.assertEqual( position.toCounts( 0.001 ), 47 )		# 46.6 counts, truncating first would give 0
+		self.assertEqual( position.toCounts( 22.5 ), 1 << 20 )
+
+
+
+if __name__ == "__main__":
+	unittest.main()